@@ -7,15 +7,2189 @@ import os
 import random
 import platform
 import subprocess
+import sys
+import argparse
 import wave
 import numpy as np
-from bitarray import bitarray
 import math
 import matplotlib.cm as cm
 import hashlib
 import json
 import tempfile
+import collections
+import functools
+import contextlib
+import threading
+import time
+import queue
+from fractions import Fraction
 import shutil
+import struct
+import zlib
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor
+
+
+# -------------------- LSB ENGINE --------------------
+def _lsb_chunks_from_bytes(data, num_lsbs):
+    """
+    Split `data` into num_lsbs-bit chunks (MSB first), one uint8 per chunk.
+    The last chunk is zero-padded on the right, like bitarray.to01().ljust().
+    """
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    pad = (-bits.size) % num_lsbs
+    if pad:
+        bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+    chunks = np.zeros((bits.size // num_lsbs, 8), dtype=np.uint8)
+    chunks[:, 8 - num_lsbs:] = bits.reshape(-1, num_lsbs)
+    return np.packbits(chunks, axis=1).ravel()
+
+
+def _lsb_embed(flat, positions, chunks, num_lsbs):
+    """Overwrite the low num_lsbs bits of flat[positions] with chunks (any unsigned dtype)."""
+    positions = positions[:chunks.size]
+    keep = np.invert(flat.dtype.type((1 << num_lsbs) - 1))
+    flat[positions] = (flat[positions] & keep) | chunks
+
+
+def _lsb_extract(flat, positions, num_lsbs):
+    """Gather flat[positions] in one fancy-index and keep the low num_lsbs bits."""
+    return flat[positions] & ((1 << num_lsbs) - 1)
+
+
+def _lsb_chunks_to_bytes(chunks, num_lsbs, nbytes):
+    """Inverse of _lsb_chunks_from_bytes: concatenate chunk bits into at most nbytes."""
+    bits = np.unpackbits(np.asarray(chunks, dtype=np.uint8)[:, None], axis=1)
+    bits = bits[:, 8 - num_lsbs:].ravel()[:nbytes * 8]
+    return np.packbits(bits[:bits.size - bits.size % 8]).tobytes()
+
+
+def _lsb_extract_bytes(flat, positions, num_lsbs, bit_offset, nbytes):
+    """
+    nbytes starting at bit_offset of the num_lsbs-bit symbol stream stored at
+    flat[positions]; only the symbols covering that bit range are gathered.
+    """
+    first = bit_offset // num_lsbs
+    last = -(-(bit_offset + nbytes * 8) // num_lsbs)
+    chunks = _lsb_extract(flat, positions[first:last], num_lsbs)
+    bits = np.unpackbits(chunks.astype(np.uint8)[:, None], axis=1)
+    bits = bits[:, 8 - num_lsbs:].ravel()[bit_offset - first * num_lsbs:][:nbytes * 8]
+    return np.packbits(bits[:bits.size - bits.size % 8]).tobytes()
+
+
+def _pixel_channel_positions(pixels, channels=3):
+    """Expand linear pixel indices into linear channel indices (R, G, B order)."""
+    pixels = np.asarray(pixels, dtype=np.int64)
+    return (pixels[:, None] * channels + np.arange(channels)).ravel()
+
+
+# Payload bytes gathered per step when streaming an audio body to disk.
+_AUDIO_BLOCK_BYTES = 8 * 1024 * 1024
+
+# Below this bound the draws are cheaper to take one word at a time.
+_SCALAR_BOUND = 4096
+
+
+def _legacy_shuffle_draws(n, seed):
+    """
+    Replay the swap targets of random.seed(seed); random.shuffle(x) for len(x) == n.
+    js[i] is the index swapped with i at step i (CPython's _randbelow(i + 1)).
+    MT19937 words come from numpy seeded with CPython's exact state, and the
+    rejection sampling of each bit-length range is solved one block at a time.
+    """
+    state = random.Random(seed).getstate()[1]
+    bitgen = np.random.MT19937()
+    bitgen.state = {"bit_generator": "MT19937",
+                    "state": {"key": np.array(state[:624], dtype=np.uint32),
+                              "pos": state[624]}}
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+    js = np.zeros(n, dtype=index_dtype)
+    words = np.empty(0, dtype=np.uint64)
+    cur = 0
+    m = n  # bound passed to randbelow, i.e. i + 1
+    while m > _SCALAR_BOUND:
+        k = m.bit_length()
+        steps_left = m - (1 << (k - 1)) + 1
+        block = min(1 << 16, 1 << ((k + 1) * 2 // 3), 2 * steps_left + 64)
+        while True:
+            if words.size - cur < block:
+                words = np.concatenate(
+                    [words[cur:], bitgen.random_raw(max(block, 1 << 16))])
+                cur = 0
+            r = (words[cur:cur + block] >> np.uint64(32 - k)).astype(np.int64)
+            # a[t] = draws accepted before word t; solve a = excl_cumsum(r < m - a)
+            a = np.floor(np.arange(block) * (m - steps_left / 2) / (1 << k)).astype(np.int64)
+            for _ in range(32):
+                acc = r < (m - a)
+                a_next = np.cumsum(acc) - acc
+                if np.array_equal(a_next, a):
+                    break
+                a = a_next
+            else:
+                block = max(1, block // 2)
+                continue
+            break
+        hits = np.flatnonzero(acc)[:steps_left]
+        take = hits.size
+        js[m - 1 - np.arange(take)] = r[hits]
+        cur += int(hits[-1]) + 1 if take == steps_left else block
+        m -= take
+    tail = words[cur:].tolist()
+    pos = 0
+    while m >= 2:
+        shift = 32 - m.bit_length()
+        while True:
+            if pos == len(tail):
+                tail = bitgen.random_raw(1 << 12).tolist()
+                pos = 0
+            r = tail[pos] >> shift
+            pos += 1
+            if r < m:
+                break
+        js[m - 1] = r
+        m -= 1
+    return js
+
+
+def _legacy_shuffle_permutation(n, seed):
+    """
+    Bit-exact, list-free equivalent of random.seed(seed); random.shuffle(x):
+    returns perm such that the shuffled list is x[perm].
+    Swap steps are grouped per target and each position's final source is
+    resolved by pointer jumping, so no Python loop runs over n.
+    """
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+    if n < 2:
+        return np.arange(n, dtype=index_dtype)
+    js = _legacy_shuffle_draws(n, seed)
+    # group the swap steps by target position, ascending step within a group
+    keys = js[1:].astype(np.int64) * n + np.arange(1, n, dtype=np.int64)
+    keys.sort()
+    targets, order = np.divmod(keys, n)
+    del keys
+    targets = targets.astype(index_dtype)
+    order = order.astype(index_dtype)
+    same = targets[1:] == targets[:-1]
+    next_same = np.full(n, -1, dtype=index_dtype)
+    next_same[order[:-1][same]] = order[1:][same]
+    starts = np.flatnonzero(np.concatenate(([True], ~same)))
+    group_pos = targets[starts]
+    first = order[starts]
+    first = np.where(first == group_pos, next_same[first], first)
+    ptr = np.arange(n, dtype=index_dtype)
+    linked = first != -1
+    ptr[group_pos[linked]] = first[linked]
+    while True:
+        hop = ptr[ptr]
+        if np.array_equal(hop, ptr):
+            break
+        ptr = hop
+    perm = js.copy()
+    perm[0] = ptr[0]
+    later = np.flatnonzero(next_same > 0)
+    perm[later] = ptr[next_same[later]]
+    return perm
+
+
+# -------------------- KEYED PERMUTATION --------------------
+def _feistel_round_keys(key_hash, tag=b"STG3"):
+    """Four 64-bit Feistel round keys derived from the secret key hash and a format tag."""
+    digest = hashlib.sha256(tag + key_hash).digest()
+    return [int.from_bytes(digest[i:i + 8], "big") for i in range(0, 32, 8)]
+
+
+def _feistel_round(half, round_key):
+    """splitmix64 finalizer over (half + round_key), wrapping in uint64."""
+    z = half + np.uint64(round_key)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return z
+
+
+def _keyed_permutation(indices, domain, round_keys):
+    """
+    Map indices (each < domain) through a keyed bijection of range(domain).
+    Balanced Feistel network on the smallest even bit width covering domain;
+    outputs that land outside the domain are cycle-walked back into it.
+    """
+    half = max(1, ((domain - 1).bit_length() + 1) // 2)
+    shift = np.uint64(half)
+    mask = np.uint64((1 << half) - 1)
+
+    def encrypt(x):
+        left, right = x >> shift, x & mask
+        for round_key in round_keys:
+            left, right = right, left ^ (_feistel_round(right, round_key) & mask)
+        return (left << shift) | right
+
+    out = encrypt(np.asarray(indices, dtype=np.uint64))
+    pending = np.flatnonzero(out >= domain)
+    while pending.size:
+        out[pending] = encrypt(out[pending])
+        pending = pending[out[pending] >= domain]
+    return out.astype(np.int64)
+
+
+def _region_header_skip(width, x1, y1, x2, y2, hdr_px):
+    """
+    Count the region pixels that overlap the first hdr_px (header) pixels.
+    Those always form a prefix of the region's raster order.
+    """
+    full_rows, rem = divmod(hdr_px, width)
+    skip = 0
+    for y in range(y1, min(y2, full_rows + 1)):
+        limit = width if y < full_rows else rem
+        skip += max(0, min(x2, limit) - x1)
+    return skip
+
+
+def _body_region(width, height, x1, y1, x2, y2, hdr_px):
+    """
+    Resolve the (0, 0, 0, 0) "full image" sentinel and drop the header prefix.
+    Returns (x1, y1, x2, y2, skip, size): body pixels are the region raster
+    ordinals skip .. skip + size - 1.
+    """
+    if x1 == y1 == x2 == y2 == 0:
+        x1, y1, x2, y2 = 0, 0, width, height
+    skip = _region_header_skip(width, x1, y1, x2, y2, hdr_px)
+    size = max(0, (x2 - x1) * (y2 - y1) - skip)
+    return x1, y1, x2, y2, skip, size
+
+
+def _region_pixels(ordinals, width, x1, y1, x2):
+    """Linear pixel indices of region raster ordinals for the rectangle at (x1, y1)."""
+    rows, cols = np.divmod(np.asarray(ordinals, dtype=np.int64), x2 - x1)
+    return (y1 + rows) * width + x1 + cols
+
+
+# -------------------- TILED MODE (STG4) --------------------
+# Covers above this many pixels (or wider/taller than uint16) are embedded
+# strip by strip; it stays below PIL's decompression-bomb limit.
+_TILED_PIXEL_THRESHOLD = 80_000_000
+# Upper bound for one strip of RGB rows held in memory.
+_TILE_BUDGET_BYTES = 64 * 1024 * 1024
+
+
+def _needs_tiled(width, height):
+    return width > 65535 or height > 65535 or width * height > _TILED_PIXEL_THRESHOLD
+
+
+def _tile_rows_for(width, height, hdr_px):
+    """Rows per strip: fits the memory budget and keeps the header in strip 0."""
+    rows = max(1, _TILE_BUDGET_BYTES // (width * 3), -(-hdr_px // width))
+    return min(rows, height)
+
+
+def _tiled_layout(width, height, x1, y1, x2, y2, tile_rows, hdr_px):
+    """
+    Split the region into image-aligned strips of tile_rows rows.
+    Returns one (local_y1, local_y2, skip, capacity) tuple per strip, with
+    region rows expressed relative to the strip's first image row.
+    """
+    layout = []
+    for top in range(0, height, tile_rows):
+        sy1 = max(y1, top) - top
+        sy2 = min(y2, top + tile_rows) - top
+        if sy2 <= sy1 or x2 <= x1:
+            layout.append((0, 0, 0, 0))
+            continue
+        skip = _region_header_skip(
+            width, x1, sy1, x2, sy2, max(0, hdr_px - top * width))
+        layout.append((sy1, sy2, skip, (x2 - x1) * (sy2 - sy1) - skip))
+    return layout
+
+
+def _tiled_allocation(capacities, body_px):
+    """Spread body_px pixels over the strips in proportion to their capacity."""
+    total = sum(capacities)
+    alloc, cum, prev = [], 0, 0
+    for capacity in capacities:
+        cum += capacity
+        bound = body_px * cum // total if total else 0
+        alloc.append(bound - prev)
+        prev = bound
+    return alloc
+
+
+def _strip_pixels(strip, n_used, key_hash, width, x1, x2, layout):
+    """Keyed, strip-local linear pixel indices for the first n_used body pixels of a strip."""
+    sy1, _, skip, capacity = layout[strip]
+    ordinals = _keyed_permutation(
+        np.arange(n_used), capacity,
+        _feistel_round_keys(key_hash, b"STG4" + strip.to_bytes(4, "big")))
+    return _region_pixels(ordinals + skip, width, x1, sy1, x2)
+
+
+class _StripReader:
+    """
+    Sequential reader that hands out RGB rows as (rows, width, 3) uint8 arrays.
+    Uncompressed layouts (in_place) also map RGB channel indices to file
+    offsets, so covers can be patched and read byte by byte.
+    """
+    streamable = True
+    in_place = False
+
+    def __init__(self):
+        self._row = 0
+
+    def read(self, n_rows):
+        n_rows = min(n_rows, self.height - self._row)
+        rows = self._read_rows(self._row, n_rows)
+        self._row += n_rows
+        return rows
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _PngStripReader(_StripReader):
+    """
+    8-bit, non-interlaced grey/RGB/RGBA PNG, inflated incrementally. Filtered
+    strips are unfiltered by PIL's C PNG row decoder, one strip at a time.
+    """
+    CHANNELS = {0: 1, 2: 3, 6: 4}
+    MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+    READ_SIZE = 1 << 20
+
+    def __init__(self, path):
+        super().__init__()
+        self._f = open(path, "rb")
+        if self._f.read(8) != b"\x89PNG\r\n\x1a\n":
+            self._f.close()
+            raise ValueError("Not a PNG file.")
+        length, ctype = struct.unpack(">I4s", self._f.read(8))
+        ihdr = self._f.read(length)
+        self._f.read(4)
+        self.width, self.height, depth, color, _, _, interlace = struct.unpack(
+            ">IIBBBBB", ihdr)
+        if ctype != b"IHDR" or depth != 8 or color not in self.CHANNELS or interlace:
+            self._f.close()
+            raise ValueError("PNG layout not supported for strip reading.")
+        self._bpp = self.CHANNELS[color]
+        self._stride = self.width * self._bpp
+        self._prev = np.zeros(self._stride, dtype=np.uint8)
+        self._z = zlib.decompressobj()
+        self._buf = bytearray()
+        self._idat = self._iter_idat()
+
+    def _iter_idat(self):
+        while True:
+            header = self._f.read(8)
+            if len(header) < 8:
+                return
+            length, ctype = struct.unpack(">I4s", header)
+            if ctype == b"IEND":
+                return
+            if ctype != b"IDAT":
+                self._f.seek(length + 4, os.SEEK_CUR)
+                continue
+            while length:
+                piece = self._f.read(min(length, self.READ_SIZE))
+                if not piece:
+                    return
+                length -= len(piece)
+                yield piece
+            self._f.read(4)  # CRC
+
+    def _fill(self, nbytes):
+        while len(self._buf) < nbytes:
+            data = self._z.unconsumed_tail or next(self._idat, None)
+            if data is None:
+                break
+            self._buf += self._z.decompress(data, nbytes - len(self._buf))
+
+    def _read_rows(self, start, n_rows):
+        need = n_rows * (self._stride + 1)
+        self._fill(need)
+        if len(self._buf) < need:
+            raise ValueError("Truncated PNG image data.")
+        raw = np.frombuffer(bytes(self._buf[:need]), dtype=np.uint8).reshape(
+            n_rows, self._stride + 1)
+        del self._buf[:need]
+        if not raw[:, 0].any():
+            rows = raw[:, 1:]
+        else:
+            if raw[:, 0].max() > 4:
+                raise ValueError("Invalid PNG filter type.")
+            # The previous row goes first, unfiltered, so Up/Average/Paeth
+            # see the same neighbours as in the whole image
+            mode = self.MODES[self._bpp]
+            data = zlib.compress(b"\x00" + self._prev.tobytes() + raw.tobytes(), 0)
+            strip = Image.frombytes(mode, (self.width, n_rows + 1), data, "zip", mode)
+            rows = np.asarray(strip).reshape(n_rows + 1, self._stride)[1:]
+        if n_rows:
+            self._prev = rows[-1].copy()
+        pixels = rows.reshape(n_rows, self.width, self._bpp)
+        if self._bpp == 1:
+            return np.repeat(pixels, 3, axis=2)
+        return np.array(pixels[:, :, :3])
+
+    def close(self):
+        self._f.close()
+
+
+class _PpmStripReader(_StripReader):
+    """Binary PPM (P6, maxval 255) rows straight from a memmap."""
+    in_place = True
+
+    def __init__(self, path):
+        super().__init__()
+        with open(path, "rb") as f:
+            head = f.read(512)
+        fields, pos = [], 0
+        while len(fields) < 4:
+            while pos < len(head) and head[pos:pos + 1].isspace():
+                pos += 1
+            if head[pos:pos + 1] == b"#":
+                pos = head.index(b"\n", pos)
+                continue
+            end = pos
+            while end < len(head) and not head[end:end + 1].isspace():
+                end += 1
+            fields.append(head[pos:end])
+            pos = end
+        if fields[0] != b"P6" or int(fields[3]) != 255:
+            raise ValueError("PPM layout not supported for strip reading.")
+        self.width, self.height = int(fields[1]), int(fields[2])
+        self._offset = pos + 1
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r", offset=self._offset,
+                             shape=(self.height, self.width, 3))
+
+    def byte_offsets(self, channels):
+        return self._offset + np.asarray(channels, dtype=np.int64)
+
+    def _read_rows(self, start, n_rows):
+        return np.array(self._mm[start:start + n_rows])
+
+    def close(self):
+        del self._mm
+
+
+class _BmpStripReader(_StripReader):
+    """Uncompressed 24/32-bit BMP rows from a memmap (bottom-up or top-down)."""
+    in_place = True
+
+    def __init__(self, path):
+        super().__init__()
+        with open(path, "rb") as f:
+            head = f.read(34)
+        offset = struct.unpack_from("<I", head, 10)[0]
+        width, height = struct.unpack_from("<ii", head, 18)
+        bpp, compression = struct.unpack_from("<HI", head, 28)
+        if head[:2] != b"BM" or bpp not in (24, 32) or compression != 0 or width <= 0:
+            raise ValueError("BMP layout not supported for strip reading.")
+        self.width, self.height = width, abs(height)
+        self._bottom_up = height > 0
+        self._bytes_pp = bpp // 8
+        self._offset = offset
+        self._stride = ((width * bpp + 31) // 32) * 4
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r", offset=offset,
+                             shape=(self.height, self._stride))
+
+    def byte_offsets(self, channels):
+        # Rows are padded to 4 bytes, stored bottom-up unless height < 0, as BGR(A)
+        pixel, ch = np.divmod(np.asarray(channels, dtype=np.int64), 3)
+        y, x = np.divmod(pixel, self.width)
+        if self._bottom_up:
+            y = self.height - 1 - y
+        return self._offset + y * self._stride + x * self._bytes_pp + (2 - ch)
+
+    def _read_rows(self, start, n_rows):
+        if self._bottom_up:
+            stop = self.height - start
+            rows = self._mm[stop - n_rows:stop][::-1]
+        else:
+            rows = self._mm[start:start + n_rows]
+        rows = rows[:, :self.width * self._bytes_pp].reshape(
+            n_rows, self.width, self._bytes_pp)
+        return np.array(rows[:, :, 2::-1])
+
+    def close(self):
+        del self._mm
+
+
+class _TiffStripReader(_StripReader):
+    """Uncompressed, chunky 8-bit RGB(A) TIFF strips from a memmap."""
+    in_place = True
+    TYPES = {1: "B", 3: "H", 4: "I"}
+
+    def __init__(self, path):
+        super().__init__()
+        tags = self._read_ifd(path)
+        self.width, self.height = tags[256][0], tags[257][0]
+        self._spp = tags.get(277, (1,))[0]
+        if (tags.get(259, (1,))[0] != 1 or tags.get(262, (0,))[0] != 2
+                or tags.get(284, (1,))[0] != 1 or set(tags.get(258, (1,))) != {8}
+                or self._spp not in (3, 4) or 273 not in tags):
+            raise ValueError("TIFF layout not supported for in-place access.")
+        self._strip_offsets = np.array(tags[273], dtype=np.int64)
+        self._rows_per_strip = min(tags.get(278, (self.height,))[0], self.height)
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+
+    @classmethod
+    def _read_ifd(cls, path):
+        with open(path, "rb") as f:
+            endian = {b"II": "<", b"MM": ">"}.get(f.read(2))
+            if endian is None:
+                raise ValueError("Not a TIFF file.")
+            magic, ifd = struct.unpack(endian + "HI", f.read(6))
+            if magic != 42:
+                raise ValueError("BigTIFF is not supported.")
+            f.seek(ifd)
+            tags = {}
+            for _ in range(struct.unpack(endian + "H", f.read(2))[0]):
+                tag, typ, count, value = struct.unpack(endian + "HHI4s", f.read(12))
+                if typ not in cls.TYPES:
+                    continue
+                fmt = endian + cls.TYPES[typ] * count
+                size = struct.calcsize(fmt)
+                if size > 4:
+                    here = f.tell()
+                    f.seek(struct.unpack(endian + "I", value)[0])
+                    value = f.read(size)
+                    f.seek(here)
+                tags[tag] = struct.unpack(fmt, value[:size])
+        return tags
+
+    def byte_offsets(self, channels):
+        pixel, ch = np.divmod(np.asarray(channels, dtype=np.int64), 3)
+        y, x = np.divmod(pixel, self.width)
+        strip, row = np.divmod(y, self._rows_per_strip)
+        return self._strip_offsets[strip] + (row * self.width + x) * self._spp + ch
+
+    def _read_rows(self, start, n_rows):
+        channels = np.arange(start * self.width * 3,
+                             (start + n_rows) * self.width * 3, dtype=np.int64)
+        return self._mm[self.byte_offsets(channels)].reshape(n_rows, self.width, 3)
+
+    def close(self):
+        del self._mm
+
+
+class _PilStripReader(_StripReader):
+    """
+    Fallback for every other format: PIL decodes the whole bitmap once, so
+    it is never used for tiled covers (see _TILED_FORMATS_ERROR).
+    """
+    streamable = False
+
+    def __init__(self, path):
+        super().__init__()
+        try:
+            self._image = Image.open(path)
+        except Image.DecompressionBombError:
+            raise ValueError(_TILED_FORMATS_ERROR) from None
+        self.width, self.height = self._image.size
+        self._arr = None
+
+    def _read_rows(self, start, n_rows):
+        if self._arr is None:
+            self._arr = np.asarray(self._image.convert("RGB"))
+        return np.array(self._arr[start:start + n_rows])
+
+    def close(self):
+        self._image.close()
+
+
+# Tiled covers must be read in strips; only these formats allow that.
+_TILED_FORMATS_ERROR = (
+    "This cover is too large to decode in one piece. Convert it to "
+    "8-bit PNG, binary PPM, BMP or TIFF so it can be read in strips.")
+
+
+def _open_strip_reader(path):
+    with open(path, "rb") as f:
+        sig = f.read(8)
+    for prefix, reader in ((b"\x89PNG", _PngStripReader), (b"P6", _PpmStripReader),
+                           (b"BM", _BmpStripReader), (b"II*\x00", _TiffStripReader),
+                           (b"MM\x00*", _TiffStripReader)):
+        if sig.startswith(prefix):
+            try:
+                return reader(path)
+            except (ValueError, KeyError, struct.error, IndexError):
+                break
+    return _PilStripReader(path)
+
+
+def _open_raw_raster(path):
+    """Strip reader for an uncompressed BMP/PPM/TIFF that can be patched in place, else None."""
+    reader = _open_strip_reader(path)
+    if reader.in_place:
+        return reader
+    reader.close()
+    return None
+
+
+def _fast_copy(src, dst):
+    """Copy a file in-kernel where possible: copy_file_range, then sendfile, then shutil."""
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        size = os.fstat(fin.fileno()).st_size
+        done = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while done < size:
+                    n = os.copy_file_range(fin.fileno(), fout.fileno(),
+                                           size - done, done, done)
+                    if n == 0:
+                        break
+                    done += n
+            except OSError:
+                pass
+        if done < size and hasattr(os, "sendfile"):
+            fout.seek(done)
+            try:
+                while done < size:
+                    n = os.sendfile(fout.fileno(), fin.fileno(), done, size - done)
+                    if n == 0:
+                        break
+                    done += n
+            except OSError:
+                pass
+        if done < size:
+            fin.seek(done)
+            fout.seek(done)
+            shutil.copyfileobj(fin, fout)
+
+
+class _PngStripWriter:
+    """Streams RGB rows into an 8-bit PNG (one zlib stream across IDATs)."""
+
+    def __init__(self, path, width, height, level=6, filters=(0,)):
+        self.width = width
+        self._filters = filters
+        self._prev = np.zeros(width * 3, dtype=np.uint8)
+        self._f = open(path, "wb")
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        _png_chunk(self._f, b"IHDR", struct.pack(
+            ">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        self._z = zlib.compressobj(level)
+
+    def write(self, rows):
+        rows = rows.reshape(rows.shape[0], -1)
+        scan = _png_filter_rows(rows, self._prev, 3, self._filters)
+        if rows.shape[0]:
+            self._prev = rows[-1].copy()
+        data = self._z.compress(scan.tobytes())
+        if data:
+            _png_chunk(self._f, b"IDAT", data)
+
+    def close(self):
+        _png_chunk(self._f, b"IDAT", self._z.flush())
+        _png_chunk(self._f, b"IEND", b"")
+        self._f.close()
+
+
+# -------------------- PARALLEL ENGINE --------------------
+# Below this many body chunks a process pool costs more than it saves.
+_PARALLEL_MIN_CHUNKS = 1 << 20
+# Work ranges start on multiples of 24 chunks: whole pixels and whole bytes.
+_CHUNK_ALIGN = 24
+# Pools run from job threads, and forking a threaded process can copy a lock
+# another thread holds; workers come from a fork server instead (Windows has
+# none, so it spawns them).
+_POOL_START_METHOD = "forkserver" \
+    if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _chunk_ranges(n_chunks, workers):
+    """Split range(n_chunks) into at most `workers` contiguous, aligned ranges."""
+    step = -(-n_chunks // max(1, workers))
+    step = max(_CHUNK_ALIGN, -(-step // _CHUNK_ALIGN) * _CHUNK_ALIGN)
+    return [(a, min(a + step, n_chunks)) for a in range(0, n_chunks, step)]
+
+
+def _range_pixels(order, px_a, px_b):
+    """
+    Linear pixels of body pixels px_a .. px_b - 1 for an embedding order:
+    ("stg3", round_keys, region_size, skip, width, x1, y1, x2) is computed
+    directly; ("shm", name, n) slices a precomputed int64 array.
+    """
+    if order[0] == "stg3":
+        _, round_keys, region_size, skip, width, x1, y1, x2 = order
+        ordinals = _keyed_permutation(np.arange(px_a, px_b), region_size, round_keys)
+        return _region_pixels(ordinals + skip, width, x1, y1, x2)
+    shm = shared_memory.SharedMemory(name=order[1])
+    try:
+        return np.ndarray(order[2], dtype=np.int64, buffer=shm.buf)[px_a:px_b].copy()
+    finally:
+        shm.close()
+
+
+def _parallel_lsb_task(task):
+    """
+    Pool worker: embed (data is bytes) or extract (data is None) one chunk range.
+    target is ("shm", name, nbytes) for a decoded bitmap or ("file", path, mode)
+    for an uncompressed cover patched through its byte-offset mapping.
+    """
+    target, order, num_lsbs, chunk_a, chunk_b, data = task
+    shm = None
+    if target[0] == "shm":
+        shm = shared_memory.SharedMemory(name=target[1])
+        flat = np.ndarray(target[2], dtype=np.uint8, buffer=shm.buf)
+        locate = np.asarray
+    else:
+        raw = _open_raw_raster(target[1])
+        raw.close()
+        flat = np.memmap(target[1], dtype=np.uint8, mode=target[2])
+        locate = raw.byte_offsets
+    try:
+        used_px = _range_pixels(order, chunk_a // 3, -(-chunk_b // 3))
+        positions = locate(
+            _pixel_channel_positions(used_px)[:chunk_b - chunk_a])
+        if data is None:
+            result = _lsb_extract(flat, positions, num_lsbs)
+        else:
+            chunks = _lsb_chunks_from_bytes(data, num_lsbs)[:chunk_b - chunk_a]
+            _lsb_embed(flat, positions, chunks, num_lsbs)
+            if shm is None:
+                flat.flush()
+            result = None
+    finally:
+        del flat
+        if shm is not None:
+            shm.close()
+    return result
+
+
+def _run_parallel_lsb(workers, target, order, num_lsbs, n_chunks, body=None):
+    """
+    Embed body (or, without body, extract n_chunks chunks) across a process pool.
+    Ranges are disjoint slices of the same position stream, so the output is
+    identical to the serial engine. An ndarray order is shared for the workers.
+    """
+    order_shm = None
+    if isinstance(order, np.ndarray):
+        order_shm = shared_memory.SharedMemory(
+            create=True, size=max(1, order.nbytes))
+        np.ndarray(order.shape, dtype=np.int64, buffer=order_shm.buf)[:] = order
+        order = ("shm", order_shm.name, order.size)
+    try:
+        tasks = []
+        for a, b in _chunk_ranges(n_chunks, workers):
+            data = None if body is None else body[
+                a * num_lsbs // 8:-(-b * num_lsbs // 8)]
+            tasks.append((target, order, num_lsbs, a, b, data))
+        context = multiprocessing.get_context(_POOL_START_METHOD)
+        if _POOL_START_METHOD == "forkserver":
+            # The server imports this module once; workers fork from it ready
+            context.set_forkserver_preload([__name__])
+        with context.Pool(max(1, min(workers, len(tasks)))) as pool:
+            results = pool.map(_parallel_lsb_task, tasks)
+    finally:
+        if order_shm is not None:
+            order_shm.close()
+            order_shm.unlink()
+    if body is None:
+        return np.concatenate(results) if results else np.zeros(0, dtype=np.uint8)
+    return None
+
+
+def _shared_copy(arr):
+    """Copy arr into a new SharedMemory block; returns (shm, view)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+    view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+    view[...] = arr
+    return shm, view
+
+
+# -------------------- STEGO OUTPUT --------------------
+# Output profiles: (container, zlib level, PNG filter types tried per row).
+# Adaptive filtering picks, per row, the candidate with the smallest sum of
+# absolute signed residuals (the heuristic suggested by the PNG spec).
+_OUTPUT_PROFILES = {
+    "png-fast": ("png", 1, (0,)),
+    "png-balanced": ("png", 6, (0, 1, 2)),
+    "png-small": ("png", 9, (0, 1, 2, 3, 4)),
+    "bmp": ("bmp", None, None),
+    "tiff": ("tiff", None, None),
+}
+# Uncompressed scanline bytes per deflate block of the parallel PNG writer.
+_PNG_BLOCK_BYTES = 1 << 20
+
+
+def _png_chunk(f, ctype, data):
+    f.write(struct.pack(">I", len(data)) + ctype)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(ctype))))
+
+
+def _png_filter_rows(rows, prev, bpp, filters):
+    """
+    Filter (n, stride) uint8 rows whose predecessor row is prev; returns the
+    (n, stride + 1) scanlines with their filter-type byte.
+    """
+    n = rows.shape[0]
+    scan = np.empty((n, rows.shape[1] + 1), dtype=np.uint8)
+    if filters == (0,):
+        scan[:, 0] = 0
+        scan[:, 1:] = rows
+        return scan
+    up = np.concatenate([prev[None, :], rows[:-1]])
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    candidates = []
+    for ftype in filters:
+        if ftype == 0:
+            candidates.append(rows)
+        elif ftype == 1:
+            candidates.append(rows - left)
+        elif ftype == 2:
+            candidates.append(rows - up)
+        elif ftype == 3:
+            avg = (left.astype(np.uint16) + up) >> 1
+            candidates.append(rows - avg.astype(np.uint8))
+        else:
+            upleft = np.zeros_like(rows)
+            upleft[:, bpp:] = up[:, :-bpp]
+            a, b, c = (v.astype(np.int16) for v in (left, up, upleft))
+            p = a + b - c
+            pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+            pred = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+            candidates.append(rows - pred.astype(np.uint8))
+    if len(candidates) == 1:
+        choice = np.zeros(n, dtype=np.intp)
+    else:
+        scores = []
+        for cand in candidates:
+            residual = cand.astype(np.int16)
+            scores.append(np.minimum(residual, 256 - residual).sum(axis=1))
+        choice = np.argmin(np.stack(scores), axis=0)
+    scan[:, 0] = np.asarray(filters, dtype=np.uint8)[choice]
+    scan[:, 1:] = np.stack(candidates)[choice, np.arange(n)]
+    return scan
+
+
+def _write_png(path, arr, level=6, filters=(0,), workers=None):
+    """
+    Write an (h, w, 3) uint8 array as PNG, pigz-style: row blocks are filtered
+    and raw-deflated on a thread pool (zlib and numpy release the GIL), each
+    block primed with the previous block's last 32 KB. Every block but the
+    last ends in a sync flush, so the concatenation is one valid zlib stream.
+    """
+    height, width = arr.shape[:2]
+    rows = arr.reshape(height, width * 3)
+    step = max(1, _PNG_BLOCK_BYTES // (width * 3 + 1))
+    starts = list(range(0, height, step))
+    zero = np.zeros(width * 3, dtype=np.uint8)
+
+    def filter_block(r0):
+        prev = rows[r0 - 1] if r0 else zero
+        return _png_filter_rows(rows[r0:r0 + step], prev, 3, filters).tobytes()
+
+    def deflate_block(i):
+        zdict = blocks[i - 1][-32768:] if i else b""
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15, 9,
+                                zlib.Z_DEFAULT_STRATEGY, zdict)
+        last = i == len(blocks) - 1
+        return comp.compress(blocks[i]) + comp.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        blocks = list(pool.map(filter_block, starts))
+        deflated = pool.map(deflate_block, range(len(blocks)))
+        adler = 1
+        for block in blocks:
+            adler = zlib.adler32(block, adler)
+        flevel = 0 if level <= 1 else 1 if level <= 5 else 2 if level == 6 else 3
+        cmf_flg = 0x7800 | (flevel << 6)
+        cmf_flg += (31 - cmf_flg % 31) % 31
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            _png_chunk(f, b"IHDR", struct.pack(
+                ">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            _png_chunk(f, b"IDAT", struct.pack(">H", cmf_flg))
+            for data in deflated:
+                _png_chunk(f, b"IDAT", data)
+            _png_chunk(f, b"IDAT", struct.pack(">I", adler))
+            _png_chunk(f, b"IEND", b"")
+
+
+def _stego_output_path(cover_path, output):
+    """stego_<name>; BMP/TIFF profiles swap in their own extension."""
+    stego_path = os.path.join(os.path.dirname(
+        cover_path), "stego_" + os.path.basename(cover_path))
+    kind = _OUTPUT_PROFILES[output][0]
+    if kind != "png":
+        stego_path = os.path.splitext(stego_path)[0] + \
+            {"bmp": ".bmp", "tiff": ".tif"}[kind]
+    return stego_path
+
+
+def _write_stego_image(path, arr, output, workers=None):
+    kind, level, filters = _OUTPUT_PROFILES[output]
+    if kind == "png":
+        _write_png(path, arr, level, filters, workers)
+    else:
+        # PIL writes both uncompressed by default
+        Image.fromarray(arr, "RGB").save(path, kind.upper())
+
+
+# -------------------- WAV I/O --------------------
+# Same fields as wave.getparams(), so the tuple can be fed to setparams().
+_WavParams = collections.namedtuple(
+    "_WavParams", "nchannels sampwidth framerate nframes comptype compname")
+
+# ds64 marks a 32-bit size field as "look in the 64-bit table instead".
+_RF64_SIZE = 0xFFFFFFFF
+
+
+class _WavFile:
+    """
+    PCM RIFF/RF64 WAV with the data chunk exposed as a uint8 np.memmap.
+    Nothing is read up front: samples(), low_bytes() and byte_offsets() are
+    views onto the mapping, so even multi-GB recordings open instantly.
+    """
+
+    def __init__(self, path, mode="r"):
+        self.path = path
+        with open(path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] not in (b"RIFF", b"RF64", b"BW64") \
+                    or riff[8:12] != b"WAVE":
+                raise ValueError("Not a WAV file.")
+            fmt, data_size, ds64_data = None, None, None
+            pos = 12
+            while pos + 8 <= file_size:
+                f.seek(pos)
+                cid, size = struct.unpack("<4sI", f.read(8))
+                if cid == b"ds64":
+                    ds64_data = struct.unpack("<Q", f.read(size)[8:16])[0]
+                elif cid == b"fmt ":
+                    fmt = f.read(size)
+                elif cid == b"data":
+                    data_size = size
+                    if size == _RF64_SIZE and ds64_data is not None:
+                        data_size = ds64_data
+                    break
+                pos += 8 + size + (size & 1)
+        if fmt is None or data_size is None:
+            raise ValueError("WAV file is missing its fmt or data chunk.")
+
+        tag, nchannels, framerate, _, block_align, bits = struct.unpack(
+            "<HHIIHH", fmt[:16])
+        if tag == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE
+            tag = struct.unpack("<H", fmt[24:26])[0]
+        if tag != 1 or nchannels == 0:
+            raise ValueError("Only uncompressed PCM WAV files are supported.")
+
+        sampwidth = (bits + 7) // 8
+        block_align = block_align or nchannels * sampwidth
+        self.data_offset = pos + 8
+        # A truncated recording keeps the frames that actually made it to disk
+        nframes = min(data_size, file_size - self.data_offset) // block_align
+        self.params = _WavParams(nchannels, sampwidth, framerate, nframes,
+                                 "NONE", "not compressed")
+        if nframes:
+            self.data = np.memmap(path, dtype=np.uint8, mode=mode, offset=self.data_offset,
+                                  shape=(nframes * block_align,))
+        else:  # mmap refuses empty mappings
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def samples(self):
+        """
+        Interleaved samples without a copy: uint8 / int16 for 8 / 16-bit,
+        an (n, 3) strided uint8 view (little-endian bytes) for 24-bit.
+        """
+        sw = self.params.sampwidth
+        if sw == 1:
+            return self.data
+        if sw == 2:
+            return self.data.view("<i2")
+        if sw == 3:
+            return self.data.reshape(-1, 3)
+        raise ValueError(
+            "Unsupported sample width. Only 8, 16, and 24-bit audio supported.")
+
+    def int_samples(self):
+        """(frames, channels) integers for analysis; only 24-bit needs a widened copy."""
+        raw = self.samples()
+        if self.params.sampwidth == 3:
+            raw = ((raw[:, 2].view(np.int8).astype(np.int32) << 16)
+                   | (raw[:, 1].astype(np.int32) << 8) | raw[:, 0])
+        return raw.reshape(-1, self.params.nchannels)
+
+    def low_bytes(self):
+        """Low (first, little-endian) byte of every sample; all that num_lsbs <= 8 touches."""
+        return self.data[::self.params.sampwidth]
+
+    def byte_offsets(self, samples):
+        """File offsets of the low bytes of the given sample indices."""
+        return self.data_offset + np.asarray(samples, dtype=np.int64) * self.params.sampwidth
+
+    def close(self):
+        if isinstance(self.data, np.memmap) and self.data.mode == "r+":
+            self.data.flush()
+        del self.data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# -------------------- BLOCK AUDIO (SAB1) --------------------
+# Optional audio layout with O(block) state: a raster header at 1 LSB, then
+# the body permuted only within fixed-size frame blocks, so covers and
+# stego files can be processed front to back, including through pipes.
+_SAB_MAGIC = b"SAB1"
+# Frames per permutation block; a multiple of 8 keeps full blocks byte-aligned.
+_SAB_BLOCK_FRAMES = 1 << 15
+# magic (4) + key hash (4) + payload length (8) + filename length (1)
+_SAB_HEADER_BYTES = 17
+_SAB_HEADER_BITS = _SAB_HEADER_BYTES * 8
+
+
+def _sab_segments(nframes, nchannels):
+    """(first frame, frame count) of the raster header segment, then of each block."""
+    hdr = min(-(-_SAB_HEADER_BITS // nchannels), nframes)
+    yield 0, hdr
+    for start in range(hdr, nframes, _SAB_BLOCK_FRAMES):
+        yield start, min(_SAB_BLOCK_FRAMES, nframes - start)
+
+
+def _sab_capacity(nframes, nchannels, num_lsbs):
+    """Body bytes a cover can carry (each block holds whole bytes only)."""
+    segments = _sab_segments(nframes, nchannels)
+    next(segments)
+    return sum(n * nchannels * num_lsbs // 8 for _, n in segments)
+
+
+def _sab_check_capacity(nframes, nchannels, num_lsbs, body_len):
+    capacity = _sab_capacity(nframes, nchannels, num_lsbs)
+    if body_len > capacity:
+        raise ValueError(
+            f"Payload too large: {body_len * 8} bits > {capacity * 8} bits available")
+
+
+def _sab_block_positions(key_hash, block, n_samples, n_used):
+    """First n_used positions of the keyed permutation of a block's n_samples samples."""
+    round_keys = _feistel_round_keys(
+        key_hash, _SAB_MAGIC + block.to_bytes(8, "big"))
+    return _keyed_permutation(np.arange(n_used), n_samples, round_keys)
+
+
+def _sab_read_header(low):
+    """(key hash[:4], payload length, filename length) from the header segment's low bytes, or None."""
+    if low.size < _SAB_HEADER_BITS:
+        return None
+    header = _lsb_chunks_to_bytes(
+        low[:_SAB_HEADER_BITS] & 1, 1, _SAB_HEADER_BYTES)
+    if header[:4] != _SAB_MAGIC:
+        return None
+    return header[4:8], int.from_bytes(header[8:16], "big"), header[16]
+
+
+def _sab_embed(read, nframes, nchannels, sampwidth, key_hash, num_lsbs,
+               filename, payload):
+    """
+    Embed block by block. read(start, n) returns the writable frame bytes of
+    n frames (uint8); each buffer is yielded once patched, and the generator
+    stops after the last block the payload touches.
+    """
+    name = filename.encode()
+    body = name + payload
+    _sab_check_capacity(nframes, nchannels, num_lsbs, len(body))
+
+    segments = _sab_segments(nframes, nchannels)
+    start, n = next(segments)
+    buf = read(start, n)
+    header = _SAB_MAGIC + key_hash[:4] + len(payload).to_bytes(8, "big") + \
+        len(name).to_bytes(1, "big")
+    _lsb_embed(buf[::sampwidth], np.arange(_SAB_HEADER_BITS),
+               _lsb_chunks_from_bytes(header, 1), 1)
+    yield buf
+
+    done = 0
+    for block, (start, n) in enumerate(segments):
+        if done >= len(body):
+            return
+        buf = read(start, n)
+        low = buf[::sampwidth]
+        piece = body[done:done + low.size * num_lsbs // 8]
+        chunks = _lsb_chunks_from_bytes(piece, num_lsbs)
+        _lsb_embed(low, _sab_block_positions(key_hash, block, low.size, chunks.size),
+                   chunks, num_lsbs)
+        done += len(piece)
+        yield buf
+
+
+def _sab_extract(read, nframes, nchannels, sampwidth, key_hash, num_lsbs):
+    """
+    Yield the filename, then the payload in block-sized pieces. read(start, n)
+    returns the frame bytes of n frames; only blocks the body occupies are read.
+    """
+    segments = _sab_segments(nframes, nchannels)
+    start, n = next(segments)
+    header = _sab_read_header(read(start, n)[::sampwidth])
+    if header is None:
+        raise ValueError("No block-mode audio header found.")
+    stored_key_hash, payload_size, filename_len = header
+    if stored_key_hash != key_hash[:4]:
+        raise ValueError("Wrong secret key.")
+    total = filename_len + payload_size
+    if filename_len == 0 or \
+            total > _sab_capacity(nframes, nchannels, num_lsbs):
+        raise ValueError("Incomplete payload data")
+
+    done, name = 0, b""
+    for block, (start, n) in enumerate(segments):
+        if done >= total:
+            return
+        low = read(start, n)[::sampwidth]
+        nbytes = min(low.size * num_lsbs // 8, total - done)
+        positions = _sab_block_positions(
+            key_hash, block, low.size, -(-nbytes * 8 // num_lsbs))
+        piece = _lsb_chunks_to_bytes(
+            _lsb_extract(low, positions, num_lsbs), num_lsbs, nbytes)
+        done += nbytes
+        if len(name) < filename_len:
+            cut = filename_len - len(name)
+            name, piece = name + piece[:cut], piece[cut:]
+            if len(name) < filename_len:
+                continue
+            yield name.decode("utf-8", errors="replace")
+        if piece:
+            yield piece
+
+
+def _pcm_wav_header(params):
+    """
+    Canonical 44-byte PCM WAV header for params, final up front: nframes is
+    known, so the data that follows can go to a pipe without seeking back.
+    """
+    block_align = params.nchannels * params.sampwidth
+    data_size = params.nframes * block_align
+    return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", 36 + data_size, b"WAVE",
+                       b"fmt ", 16, 1, params.nchannels, params.framerate,
+                       params.framerate * block_align, block_align,
+                       params.sampwidth * 8, b"data", data_size)
+
+
+def _audio_stream_main(argv):
+    """Block-mode (SAB1) audio from the command line; '-' streams WAV via stdin/stdout."""
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description="Block-mode audio steganography over WAV files or pipes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    enc = commands.add_parser("audio-encode", help="embed a file into a WAV stream")
+    enc.add_argument("payload", help="file to hide")
+    enc.add_argument("--name", help="filename stored with the payload")
+    dec = commands.add_parser("audio-decode", help="extract the payload of a WAV stream")
+    for cmd in (enc, dec):
+        cmd.add_argument("-k", "--key", required=True, help="secret key")
+        cmd.add_argument("-n", "--lsbs", type=int, default=1, choices=range(1, 9),
+                         help="LSBs per sample (default: 1)")
+        cmd.add_argument("-i", "--input", default="-", help="WAV input (default: stdin)")
+        cmd.add_argument("-o", "--output", default="-", help="output (default: stdout)")
+    args = parser.parse_args(argv)
+    key_hash = hashlib.sha256(args.key.encode()).digest()
+
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    with src, wave.open(src, "rb") as reader:
+        params = reader.getparams()
+        if params.sampwidth not in (1, 2, 3):
+            raise ValueError(
+                "Unsupported sample width. Only 8, 16, and 24-bit audio supported.")
+
+        def read(start, n_frames):
+            # segments come in file order, so start is implied by the stream
+            return np.frombuffer(bytearray(reader.readframes(n_frames)), dtype=np.uint8)
+
+        dst = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        with dst:
+            if args.command == "audio-encode":
+                with open(args.payload, "rb") as f:
+                    payload = f.read()
+                name = args.name or os.path.basename(args.payload)
+                # Not wave's writer: its close() seeks to patch the header
+                # whenever fewer frames arrived, which fails on a pipe
+                dst.write(_pcm_wav_header(params))
+                for buf in _sab_embed(read, params.nframes, params.nchannels,
+                                      params.sampwidth, key_hash, args.lsbs,
+                                      name, payload):
+                    dst.write(buf)
+                rest = reader.readframes(_SAB_BLOCK_FRAMES)
+                while rest:
+                    dst.write(rest)
+                    rest = reader.readframes(_SAB_BLOCK_FRAMES)
+            else:
+                pieces = _sab_extract(read, params.nframes, params.nchannels,
+                                      params.sampwidth, key_hash, args.lsbs)
+                name = next(pieces)
+                for piece in pieces:
+                    dst.write(piece)
+                print(f"Extracted: {name}", file=sys.stderr)
+                if args.input == "-":
+                    # Drain stdin so an encoder upstream can finish writing
+                    while src.read(1 << 16):
+                        pass
+
+
+# -------------------- AUDIO RANGE (SAR1) --------------------
+# Audio counterpart of an image region: the body is permuted only over the
+# samples of a selected frame range, which the raster header records so
+# decode can go straight to those samples.
+_SAR_MAGIC = b"SAR1"
+# magic (4) + key hash (4) + payload length (8) + filename length (1)
+# + start frame (8) + end frame (8)
+_SAR_HEADER_BYTES = 33
+_SAR_HEADER_BITS = _SAR_HEADER_BYTES * 8
+
+
+def _sar_body_range(nchannels, start_frame, end_frame):
+    """(first sample, sample count) of a frame range, minus any header overlap."""
+    first, last = start_frame * nchannels, end_frame * nchannels
+    first = max(first, min(_SAR_HEADER_BITS, last))
+    return first, last - first
+
+
+def _sar_positions(key_hash, first, size, start, stop):
+    """Sample indices of body symbols start .. stop - 1."""
+    return first + _keyed_permutation(np.arange(start, stop), size,
+                                      _feistel_round_keys(key_hash, _SAR_MAGIC))
+
+
+def _sar_read_header(low):
+    """(key hash[:4], payload length, filename length, start frame, end frame), or None."""
+    if low.size < _SAR_HEADER_BITS:
+        return None
+    header = _lsb_chunks_to_bytes(
+        low[:_SAR_HEADER_BITS] & 1, 1, _SAR_HEADER_BYTES)
+    if header[:4] != _SAR_MAGIC:
+        return None
+    return (header[4:8], int.from_bytes(header[8:16], "big"), header[16],
+            int.from_bytes(header[17:25], "big"), int.from_bytes(header[25:33], "big"))
+
+
+# -------------------- VIDEO PROBE --------------------
+# Probes kept for recently used (path, size, mtime) keys.
+_PROBE_CACHE_SIZE = 32
+# Container tag the encoder leaves on stego videos: the time in seconds after
+# the first keyframe of the frame holding the STG header (and any SVM1
+# manifest). Only that one time is written; where the other pieces sit stays
+# inside the encrypted manifest.
+_HEADER_TIME_TAG = "TIME_OFFSET"
+
+
+def _parse_rate(text):
+    """ffprobe rate string ('30000/1001', '25', '0/0') as a Fraction; 0 when unknown."""
+    try:
+        return Fraction(text)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return Fraction(0)
+
+
+def _parse_header_time(tags):
+    """The time in the _HEADER_TIME_TAG of ffprobe's format tags; None if absent or malformed."""
+    value = {k.upper(): v for k, v in (tags or {}).items()}.get(_HEADER_TIME_TAG)
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if np.isfinite(seconds) else None
+
+
+def _header_time_metadata(seconds):
+    """ffmpeg output options tagging seconds as the header frame's time."""
+    return ["-metadata", f"{_HEADER_TIME_TAG}={seconds:.6f}"]
+
+
+def _video_packets(path):
+    """
+    (pts seconds, keyframe?, byte position) of the first video stream's
+    packets in file order, with nan / -1 where unknown. Only packet headers
+    are read, and ffprobe is stopped as soon as the caller stops iterating.
+    """
+    if shutil.which("ffprobe") is None:
+        raise ValueError("FFprobe not found. Please install FFmpeg.")
+    proc = subprocess.Popen(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,pos,flags",
+         "-of", "compact=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in proc.stdout:
+            fields = dict(item.partition("=")[::2]
+                          for item in line.strip().split("|"))
+            try:
+                pts = float(fields.get("pts_time"))
+            except (TypeError, ValueError):  # N/A
+                pts = float("nan")
+            pos = int(fields["pos"]) if fields.get(
+                "pos", "N/A").isdigit() else -1
+            yield pts, "K" in fields.get("flags", ""), pos
+        if proc.wait() != 0:
+            raise ValueError("Failed to read video packets.")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+def _keyframe_index(path, limit=None):
+    """
+    (pts seconds, byte positions) of the first video stream's keyframes, sorted
+    by pts. Nothing is decoded, and reading stops after limit keyframes.
+    """
+    pts, pos = [], []
+    with contextlib.closing(_video_packets(path)) as packets:
+        for t, key, p in packets:
+            if not key:
+                continue
+            pts.append(t)
+            pos.append(p)
+            if limit is not None and len(pts) >= limit:
+                break
+    pts = np.asarray(pts, dtype=np.float64)
+    order = np.argsort(pts, kind="stable")
+    return pts[order], np.asarray(pos, dtype=np.int64)[order]
+
+
+def _frames_before(path, times):
+    """
+    How many frames of path are shown before each of times (seconds on
+    ffprobe's timeline), i.e. each frame's index in decoded output. Packets
+    are read up to the first keyframe past the latest time; open-GOP frames
+    shown earlier are all decoded before that keyframe.
+    """
+    last = max(times)
+    pts = []
+    with contextlib.closing(_video_packets(path)) as packets:
+        for t, key, _ in packets:
+            if key and t > last:
+                break
+            pts.append(t)
+    pts = np.sort(np.asarray(pts, dtype=np.float64))
+    return [int(i) for i in np.searchsorted(pts, times)]
+
+
+def _constant_frame_rate(path, fps):
+    """
+    Whether each frame of path follows the one before by a period of fps,
+    give or take a quarter frame of timestamp rounding. Only packet headers
+    are read; packets without a pts are skipped.
+    """
+    with contextlib.closing(_video_packets(path)) as packets:
+        pts = np.sort([t for t, _, _ in packets if np.isfinite(t)])
+    period = 1 / float(fps)
+    return bool(np.all(np.abs(np.diff(pts) - period) <= period / 4))
+
+
+class VideoProbe:
+    """
+    Stream and format info of a video's first video stream from a single
+    ffprobe call. Keyframes are only enumerated when first asked for.
+    Use VideoProbe.of(path), which reuses probes of unchanged files.
+    """
+
+    def __init__(self, path):
+        if shutil.which("ffprobe") is None:
+            raise ValueError("FFprobe not found. Please install FFmpeg.")
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries",
+             "stream=width,height,r_frame_rate,avg_frame_rate,codec_name,pix_fmt"
+             f":format=duration,start_time:format_tags={_HEADER_TIME_TAG}",
+             "-of", "json", path],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise ValueError("Failed to get video stream info.")
+        data = json.loads(result.stdout)
+        if not data.get("streams"):
+            raise ValueError("No video stream found.")
+        stream = data["streams"][0]
+
+        self.path = path
+        self.width = int(stream.get("width", 0))
+        self.height = int(stream.get("height", 0))
+        self.fps = _parse_rate(stream.get("r_frame_rate")) or \
+            _parse_rate(stream.get("avg_frame_rate"))
+        # Format-level duration is the reliable one for MKV/MP4
+        self.duration = float(data.get("format", {}).get("duration") or 0)
+        # ffmpeg rebases timestamps on this, so -ss and filter times count from it
+        self.start_time = float(data.get("format", {}).get("start_time") or 0)
+        self.codec_name = stream.get("codec_name", "")
+        self.pix_fmt = stream.get("pix_fmt", "")
+        # Where the encoder put the header frame; None for other videos
+        self.header_time = _parse_header_time(
+            data.get("format", {}).get("tags"))
+        self._keyframes = None
+        self._keyframes_complete = False
+        # Probes are shared across job threads and the Tk thread
+        self._keyframes_lock = threading.Lock()
+
+    @classmethod
+    def of(cls, path):
+        st = os.stat(path)
+        return _cached_video_probe(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def keyframes(self, limit=None):
+        """
+        Sorted (pts seconds, byte positions) of the first limit keyframes (all
+        when None). The index is kept, so asking again never rereads packets.
+        """
+        with self._keyframes_lock:
+            known = self._keyframes
+            if known is None or not (self._keyframes_complete or
+                                     (limit is not None and known[0].size >= limit)):
+                self._keyframes = _keyframe_index(self.path, limit)
+                self._keyframes_complete = limit is None or \
+                    self._keyframes[0].size < limit
+            pts, pos = self._keyframes
+        return (pts, pos) if limit is None else (pts[:limit], pos[:limit])
+
+    @property
+    def keyframe_count(self):
+        return self.keyframes()[0].size
+
+
+@functools.lru_cache(maxsize=_PROBE_CACHE_SIZE)
+def _cached_video_probe(path, size, mtime_ns):
+    # size and mtime only take part in the key: a rewritten file probes afresh
+    return VideoProbe(path)
+
+
+# -------------------- VIDEO FRAME I/O --------------------
+# Frames travel between ffmpeg and numpy as rgb24 rawvideo over pipes,
+# so no image file is encoded, written or decoded along the way.
+_IFRAME_FILTER = "select='eq(pict_type\\,I)'"
+# Decoded frames kept in memory across tabs, in bytes (~90 1080p frames).
+_FRAME_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class FrameCache:
+    """
+    Decoded frames by (path, size, mtime, position), least recently used
+    evicted first once their bytes pass the budget. Frames are handed out
+    read-only and shared, so copy one before changing it. Thread-safe.
+    """
+
+    def __init__(self, budget=_FRAME_CACHE_BYTES):
+        self.budget = budget
+        self.nbytes = 0
+        self._frames = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def frame(self, path, position, read):
+        """
+        The frame of path at position (any hashable naming it), calling
+        read() for it on a miss. A rewritten file never hits old entries.
+        """
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns, position)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                return frame
+        frame = read()
+        frame.flags.writeable = False
+        if frame.nbytes <= self.budget:
+            with self._lock:
+                if key not in self._frames:
+                    self._frames[key] = frame
+                    self.nbytes += frame.nbytes
+                while self.nbytes > self.budget:
+                    _, old = self._frames.popitem(last=False)
+                    self.nbytes -= old.nbytes
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+
+_FRAME_CACHE = FrameCache()
+
+
+def _read_exact(stream, frame):
+    """Fill frame's buffer from stream; False if the stream ends first."""
+    view, got = memoryview(frame).cast("B"), 0
+    while got < frame.nbytes:
+        n = stream.readinto(view[got:])
+        if not n:
+            return False
+        got += n
+    return True
+
+
+def _read_rgb_frame(path, input_args, missing):
+    """
+    One frame of path as an (h, w, 3) uint8 array, read from ffmpeg's stdout.
+    input_args holds the -i and whatever picks the frame; missing is the
+    error message when ffmpeg produces nothing. Frames come out as stored,
+    not autorotated, so they match the probe's width and height.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise ValueError("FFmpeg not found. Please install FFmpeg.")
+    probe = VideoProbe.of(path)
+    frame = np.empty((probe.height, probe.width, 3), dtype=np.uint8)
+    with subprocess.Popen(
+            ["ffmpeg", "-v", "error", "-noautorotate", *input_args, "-frames:v", "1",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        complete = _read_exact(proc.stdout, frame)
+    if not complete or not frame.size:
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+        raise ValueError(missing)
+    return frame
+
+
+def _read_first_iframe(path):
+    """The first I-frame of path as a read-only (h, w, 3) uint8 array."""
+    return _FRAME_CACHE.frame(path, "first I-frame", lambda: _read_rgb_frame(
+        path, ["-i", path, "-vf", _IFRAME_FILTER, "-vsync", "vfr"],
+        "No I-frame found in video."))
+
+
+def _stego_frame_time(path):
+    """
+    Seconds from the start of path (the -ss timeline) to the frame holding
+    the STG header: the tagged time when the encoder left one, otherwise the
+    first keyframe. Only packet headers are read.
+    """
+    probe = VideoProbe.of(path)
+    pts, _ = probe.keyframes(1)
+    if not pts.size or not np.isfinite(pts[0]):
+        raise ValueError("Could not locate the video's keyframes.")
+    # Muxers may shift the stream, so the tagged time counts from its first keyframe
+    first = float(pts[0]) - probe.start_time
+    return first if probe.header_time is None else first + probe.header_time
+
+
+def _read_stego_frame(path):
+    """
+    The frame holding path's STG header as a read-only (h, w, 3) uint8 array. Tagged
+    videos are seeked straight to it, so the cost doesn't grow with how far
+    into the video it sits; untagged ones fall back to the first I-frame.
+    """
+    if VideoProbe.of(path).header_time is None:
+        return _read_first_iframe(path)
+    return _read_frame_at(path, _stego_frame_time(path))
+
+
+def _half_frame(probe):
+    """Half a frame period in seconds (0 when the rate is unknown)."""
+    return 0.5 / float(probe.fps) if probe.fps else 0.0
+
+
+def _read_frame_at(path, seconds):
+    """
+    The frame shown at seconds from the start of path, read-only. The seek
+    lands half a frame early, so rounding in the timestamp can't skip past
+    the frame.
+    """
+    start = max(0.0, seconds - _half_frame(VideoProbe.of(path)))
+    return _FRAME_CACHE.frame(
+        path, round(seconds, 6),
+        lambda: _read_rgb_frame(path, ["-ss", f"{start:.6f}", "-i", path],
+                                f"No frame at {seconds:.3f}s in video."))
+
+
+def _raw_frame_input(width, height, fps=None):
+    """ffmpeg input options for (height, width, 3) uint8 frames fed on stdin."""
+    rate = ["-framerate", str(fps)] if fps else []
+    return ["-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            *rate, "-i", "pipe:0"]
+
+
+# -------------------- GOP SPLICE --------------------
+# Pixel formats holding rgb24 samples exactly, so embedded LSBs survive encoding.
+_LOSSLESS_RGB_PIX_FMTS = frozenset({
+    "rgb24", "bgr24", "rgb0", "bgr0", "0rgb", "0bgr",
+    "rgba", "bgra", "argb", "abgr", "gbrp", "gbrap"})
+# Lossless codecs one GOP can be re-encoded in and concatenated back between
+# stream-copied GOPs, with the output profiles to try for each. A track has
+# one set of codec parameters, so the GOP only joins cleanly when its
+# extradata matches the cover's.
+_SPLICE_PROFILES = {
+    "ffv1": ("ffv1", "ffv1-mt"),
+    "h264": ("x264-lossless",),
+    "hevc": ("x265-lossless",),
+}
+
+
+def _run_ffmpeg(args, frame=None):
+    """Run ffmpeg quietly, feeding frame's bytes on stdin; stderr goes to the console on failure."""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", *args],
+        input=None if frame is None else memoryview(frame).cast("B"),
+        capture_output=True)
+    if result.returncode != 0:
+        print(f"stderr: {result.stderr.decode(errors='replace')}")
+        raise subprocess.CalledProcessError(result.returncode, result.args)
+
+
+def _extradata_hash(path):
+    """Hash of the first video stream's codec extradata; '' when there is none."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_streams",
+         "-show_data_hash", "SHA256", "-of", "json", path],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ValueError("Failed to get video stream info.")
+    streams = json.loads(result.stdout).get("streams") or [{}]
+    return streams[0].get("extradata_hash", "")
+
+
+def _splice_keyframe(cover_path, frame, stego_path):
+    """
+    Write cover_path to stego_path with its first keyframe replaced by frame.
+    Only the GOP that keyframe opens is decoded and re-encoded; every later
+    GOP and the audio are stream-copied, so the work grows with GOP length
+    rather than with the length of the video. Returns the output profile
+    the GOP was re-encoded with.
+    """
+    probe = VideoProbe.of(cover_path)
+    if probe.codec_name not in _SPLICE_PROFILES or \
+            probe.pix_fmt not in _LOSSLESS_RGB_PIX_FMTS:
+        raise ValueError(
+            f"GOP splice needs a lossless RGB cover ({', '.join(_SPLICE_PROFILES)}), "
+            f"not {probe.codec_name or '?'}/{probe.pix_fmt or '?'}. "
+            "Turn splice off to re-encode the whole video.")
+    if not probe.fps:
+        raise ValueError("Could not determine the video frame rate.")
+    pts, _ = probe.keyframes(2)
+    if not pts.size or not np.isfinite(pts).all():
+        raise ValueError("Could not locate the video's keyframes.")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Split on keyframes without decoding; the first segment is the target GOP.
+        # The segment muxer cuts at the first keyframe at or after the given
+        # time, so cutting half a frame early keeps rounding from skipping it.
+        cut = ["-segment_times",
+               f"{pts[1] - probe.start_time - _half_frame(probe):.6f}"] \
+            if pts.size > 1 else []
+        _run_ffmpeg(["-i", cover_path, "-map", "0:v:0", "-c", "copy",
+                     "-f", "segment", "-reset_timestamps", "1", *cut,
+                     os.path.join(tmpdir, "seg%05d.mkv")])
+        segments = sorted(os.path.join(tmpdir, name)
+                          for name in os.listdir(tmpdir) if name.startswith("seg"))
+
+        listing = os.path.join(tmpdir, "segments.txt")
+        gop_path = os.path.join(tmpdir, "gop.mkv")
+        with open(listing, "w") as f:
+            f.writelines(f"file '{path}'\n" for path in [gop_path, *segments[1:]])
+
+        # Compared against the cover itself: remuxing can pad the extradata
+        cover_extradata = _extradata_hash(cover_path) if len(segments) > 1 else ""
+        for profile in _SPLICE_PROFILES[probe.codec_name]:
+            # Re-encode that GOP with its first frame swapped for the stego frame;
+            # interleave merges by timestamp, so the GOP keeps its own frame timing
+            _run_ffmpeg(["-noautorotate", "-i", segments[0],
+                         *_raw_frame_input(probe.width, probe.height),
+                         "-filter_complex",
+                         "[1:v]setsar=1,settb=AVTB,setpts=0[s]; "
+                         "[0:v]trim=start_frame=1,setsar=1,settb=AVTB[r]; "
+                         "[s][r]interleave[v]",
+                         "-map", "[v]", *_VIDEO_PROFILES[profile],
+                         "-pix_fmt", probe.pix_fmt, gop_path], frame)
+            if len(segments) > 1 and _extradata_hash(gop_path) != cover_extradata:
+                continue  # encoded with other settings than the cover
+            _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", listing, "-i", cover_path,
+                         "-map", "0:v", "-map", "1:a?", "-c", "copy",
+                         *_header_time_metadata(0.0), stego_path])
+            if _splice_intact(cover_path, stego_path, frame, pts):
+                return profile
+
+    if os.path.exists(stego_path):
+        os.remove(stego_path)
+    raise ValueError(
+        "The stego GOP could not be spliced in bit-exactly. "
+        "Turn splice off to re-encode the whole video.")
+
+
+def _splice_intact(cover_path, stego_path, frame, pts):
+    """
+    Whether the stego keyframe decodes bit-exactly and the first stream-copied
+    GOP after the seam still decodes to the cover's frame. The seam is decoded
+    through from the start: seeking past it would reset the decoder and hide
+    a settings mismatch.
+    """
+    try:
+        if not np.array_equal(_read_stego_frame(stego_path), frame):
+            return False
+        if pts.size < 2:
+            return True
+        cover, stego = VideoProbe.of(cover_path), VideoProbe.of(stego_path)
+        stego_first, _ = stego.keyframes(1)
+        seam = float(stego_first[0]) - stego.start_time + float(pts[1] - pts[0])
+        across = _read_rgb_frame(
+            stego_path, ["-i", stego_path, "-ss",
+                         f"{max(0.0, seam - _half_frame(stego)):.6f}"],
+            "No frame after the splice seam.")
+        return np.array_equal(
+            across, _read_frame_at(cover_path, float(pts[1]) - cover.start_time))
+    except (ValueError, subprocess.CalledProcessError):
+        return False
+
+
+# -------------------- VIDEO PIPELINE --------------------
+# Frames held between two pipeline stages. A full queue stalls the stage
+# feeding it, so memory stays bounded and the slowest stage sets the pace.
+_PIPELINE_QUEUE_FRAMES = 8
+# How often blocked stages look for a cancel.
+_PIPELINE_POLL_SECONDS = 0.1
+# Lossless output profiles: ffmpeg encoder options. Every one stores rgb24
+# exactly - FFV1 and x264rgb as RGB, x265 as planar GBR 4:4:4.
+_VIDEO_PROFILES = {
+    "ffv1": ["-c:v", "ffv1"],
+    "ffv1-mt": ["-c:v", "ffv1", "-level", "3", "-threads", "0",
+                "-slices", "16", "-slicecrc", "1"],
+    "x264-lossless": ["-c:v", "libx264rgb", "-qp", "0", "-preset", "veryfast"],
+    "x265-lossless": ["-c:v", "libx265", "-preset", "fast", "-pix_fmt", "gbrp",
+                      "-x265-params", "lossless=1:log-level=error"],
+}
+
+
+class VideoPipeline:
+    """
+    Re-encode a video losslessly with some of its frames rewritten, as three
+    overlapping stages: an ffmpeg decoder writing rgb24 frames to a pipe, an
+    embed stage running the edits on a thread pool, and an ffmpeg encoder
+    reading frames from stdin. Wall-clock time follows the slowest stage
+    rather than the sum of all three. cancel() may be called from any thread.
+
+    Every decoded frame is passed through once, in order, and written at
+    the cover's nominal rate with one of _VIDEO_PROFILES, so variable-rate
+    covers are refused; the audio is stream-copied from the cover. The time
+    of the first frame edits lists is tagged on the output as the header
+    frame's.
+    """
+
+    def __init__(self, cover_path, stego_path, profile="ffv1-mt",
+                 queue_frames=_PIPELINE_QUEUE_FRAMES, progress=None):
+        if shutil.which("ffmpeg") is None:
+            raise ValueError("FFmpeg not found. Please install FFmpeg.")
+        if profile not in _VIDEO_PROFILES:
+            raise ValueError(f"Unknown video output profile: {profile}")
+        self.cover_path = cover_path
+        self.stego_path = stego_path
+        self.profile = profile
+        self.probe = VideoProbe.of(cover_path)
+        if not self.probe.fps:
+            raise ValueError("Could not determine the video frame rate.")
+        # Frames are re-encoded at the nominal rate, which would retime a
+        # variable-rate cover and leave it drifting against its audio
+        if not _constant_frame_rate(cover_path, self.probe.fps):
+            raise ValueError(
+                "Variable frame rate videos can't be re-encoded without "
+                "losing their timing. Convert the cover to a constant frame "
+                "rate first (e.g. ffmpeg -i cover.mp4 -fps_mode cfr cover_cfr.mkv).")
+        self.queue_frames = queue_frames
+        # Called from the embed stage with the fraction of frames passed on
+        self.progress = progress
+        self.frames = 0
+        self.elapsed = 0.0
+        self.digests = {}  # frame index -> sha256 of the edited frame
+        self._cancel = threading.Event()
+        self._procs = []
+        self._errors = []
+
+    def frame_indices(self, times):
+        """Decoded-order indices of the frames shown at times (ffprobe pts)."""
+        return _frames_before(self.cover_path,
+                              [t - _half_frame(self.probe) for t in times])
+
+    def frame_time(self, index):
+        """Where frame index lands in the output, in seconds."""
+        return index / float(self.probe.fps)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        for proc in list(self._procs):
+            if proc.poll() is None:
+                proc.kill()
+
+    def run(self, edits, workers=None):
+        """
+        edits maps frame indices to callables taking the decoded (h, w, 3)
+        uint8 frame and returning the frame to encode; the first one is the
+        header frame. Returns the number of frames written; a failed or
+        cancelled run leaves no output behind.
+        """
+        decoded = queue.Queue(self.queue_frames)
+        encoded = queue.Queue(self.queue_frames)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            stages = [self._stage(self._decode, decoded),
+                      self._stage(self._embed, decoded, encoded, edits, pool),
+                      self._stage(self._encode, encoded,
+                                  self.frame_time(next(iter(edits))))]
+            for stage in stages:
+                stage.join()
+        self.elapsed = time.perf_counter() - started
+        if not self._errors and not self.cancelled and \
+                any(index >= self.frames for index in edits):
+            self._errors.append(ValueError(
+                "The video ended before every frame to embed was reached."))
+        if self._errors or self.cancelled:
+            if os.path.exists(self.stego_path):
+                os.remove(self.stego_path)
+            if self._errors:
+                raise self._errors[0]
+            raise ValueError("Video encoding was cancelled.")
+        return self.frames
+
+    def verify(self, workers=None):
+        """
+        Decode every edited frame back from the output and compare it with
+        what was handed to the encoder, bit for bit. Returns how many frames
+        were checked; on a mismatch the output is removed.
+        """
+        probe = VideoProbe.of(self.stego_path)
+        pts, _ = probe.keyframes(1)
+        # Muxers may shift the stream; frame 0 sits on the first keyframe
+        base = float(pts[0]) - probe.start_time if pts.size else 0.0
+
+        def intact(index):
+            frame = _read_frame_at(self.stego_path,
+                                   base + self.frame_time(index))
+            return hashlib.sha256(frame).digest() == self.digests[index]
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            damaged = [index for index, ok in zip(
+                self.digests, pool.map(intact, self.digests)) if not ok]
+        if damaged:
+            os.remove(self.stego_path)
+            raise ValueError(
+                f"Output profile {self.profile} did not keep {len(damaged)} "
+                f"stego frame(s) bit-exact; pick another profile.")
+        return len(self.digests)
+
+    def report(self):
+        """One line on speed and size, e.g. for the success message."""
+        size = os.path.getsize(self.stego_path)
+        cover = os.path.getsize(self.cover_path) or 1
+        rate = self.frames / self.elapsed if self.elapsed else 0.0
+        return (f"{self.profile}: {self.frames} frames in {self.elapsed:.1f}s "
+                f"({rate:.1f} fps), {size / 1048576:.1f} MB "
+                f"({size / cover:.1f}x cover)")
+
+    def _stage(self, body, *args):
+        def run():
+            try:
+                body(*args)
+            except Exception as e:
+                self._errors.append(e)
+                self.cancel()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _spawn(self, args, **kwargs):
+        proc = subprocess.Popen(args, **kwargs)
+        self._procs.append(proc)
+        if self.cancelled:
+            proc.kill()
+        return proc
+
+    def _put(self, q, item):
+        while not self.cancelled:
+            try:
+                q.put(item, timeout=_PIPELINE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        """Next item, or None at the end of the stream or on cancel."""
+        while not self.cancelled:
+            try:
+                return q.get(timeout=_PIPELINE_POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return None
+
+    def _decode(self, decoded):
+        probe = self.probe
+        proc = self._spawn(
+            ["ffmpeg", "-v", "error", "-noautorotate", "-i", self.cover_path,
+             "-map", "0:v:0",
+             "-vsync", "passthrough",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        with proc:
+            while True:
+                frame = np.empty((probe.height, probe.width, 3), dtype=np.uint8)
+                if not _read_exact(proc.stdout, frame) or \
+                        not self._put(decoded, frame):
+                    break
+        if proc.returncode != 0 and not self.cancelled:
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+        self._put(decoded, None)
+
+    def _embed(self, decoded, encoded, edits, pool):
+        probe = self.probe
+        # Estimated from the duration; reported once per percent
+        total = int(probe.duration * probe.fps)
+        index = 0
+        while True:
+            frame = self._get(decoded)
+            if frame is None:
+                break
+            edit = edits.get(index)
+            # Futures queue up in frame order; the encoder waits on each in turn
+            item = pool.submit(self._apply, edit, index, frame) if edit else frame
+            if not self._put(encoded, item):
+                return
+            index += 1
+            if self.progress and total and index * 100 // total != \
+                    (index - 1) * 100 // total:
+                self.progress(min(1.0, index / total))
+        self.frames = index
+        self._put(encoded, None)
+
+    def _apply(self, edit, index, frame):
+        frame = edit(frame)
+        self.digests[index] = hashlib.sha256(frame).digest()
+        return frame
+
+    def _encode(self, encoded, header_time):
+        probe = self.probe
+        proc = self._spawn(
+            ["ffmpeg", "-v", "error", "-y",
+             *_raw_frame_input(probe.width, probe.height, probe.fps),
+             "-i", self.cover_path, "-map", "0:v", "-map", "1:a?",
+             *_VIDEO_PROFILES[self.profile], "-c:a", "copy",
+             *_header_time_metadata(header_time), self.stego_path],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE)
+        with proc:
+            try:
+                while True:
+                    item = self._get(encoded)
+                    if item is None:
+                        break
+                    frame = item if isinstance(item, np.ndarray) else item.result()
+                    proc.stdin.write(memoryview(frame).cast("B"))
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass  # the encoder quit early; its exit status says why
+            errors = proc.stderr.read()
+        if proc.returncode != 0 and not self.cancelled:
+            print(f"stderr: {errors.decode(errors='replace')}")
+            raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+
+# -------------------- MULTI-KEYFRAME VIDEO (SVM1) --------------------
+# The payload is cut into pieces, one STG3-layout embed per carrier keyframe.
+# The first keyframe's header carries _SVM_MAGIC in place of STG3, and its
+# piece starts with a manifest: piece count (2 bytes), payload length (8),
+# then each carrier's time in microseconds after the first keyframe (8 bytes,
+# signed), in payload order. Muxers may shift the whole stream, so times
+# count from that keyframe rather than from the file start.
+_SVM_MAGIC = b"SVM1"
+_SVM_FIXED_BYTES = 10
+# Pixels taken by the 21-byte STG2/STG3 header at 1 LSB.
+_STG_HEADER_PX = 56
+
+
+def _svm_frame_capacity(width, height, num_lsbs):
+    """Filename plus payload bytes one full-frame STG3 body holds."""
+    return max(0, (width * height - _STG_HEADER_PX) * 3 * num_lsbs // 8)
+
+
+def _svm_frame_count(frame_capacity, payload_len, fn_len):
+    """
+    Carrier frames needed; every frame also pays 8 manifest bytes. The whole
+    manifest and the filename sit in the first frame, so they must fit there.
+    """
+    per_frame = frame_capacity - 8
+    if per_frame <= 0:
+        raise ValueError("Frames are too small to carry any payload.")
+    count = max(1, -(-(payload_len + fn_len + _SVM_FIXED_BYTES) // per_frame))
+    if _SVM_FIXED_BYTES + 8 * count + fn_len > frame_capacity:
+        raise ValueError(
+            f"Payload too large: its {count}-keyframe manifest doesn't fit "
+            f"in one frame; use more LSBs or a larger video.")
+    return count
+
+
+def _svm_schedule(key_hash, keyframe_count, count):
+    """
+    Keyframe indices of the count carriers in payload order: the first
+    keyframe (which holds the manifest), then count - 1 others picked by the key.
+    """
+    rest = _keyed_permutation(np.arange(count - 1), keyframe_count - 1,
+                              _feistel_round_keys(key_hash, _SVM_MAGIC)) + 1
+    return np.concatenate(([0], rest)).astype(np.int64)
+
+
+def _svm_pieces(payload_data, frame_capacity, fn_len, times):
+    """Per-carrier bodies; the first is the manifest plus the payload's head."""
+    if len(times) > 0xFFFF:
+        raise ValueError("Payload needs more than 65535 keyframes.")
+    manifest = (len(times).to_bytes(2, "big") +
+                len(payload_data).to_bytes(8, "big") +
+                b"".join(int(round(t * 1e6)).to_bytes(8, "big", signed=True)
+                         for t in times))
+    head = frame_capacity - fn_len - len(manifest)
+    pieces = [manifest + payload_data[:head]]
+    for start in range(head, len(payload_data), frame_capacity):
+        pieces.append(payload_data[start:start + frame_capacity])
+    return pieces
+
+
+def _svm_read_manifest(body):
+    """(payload length, carrier time offsets, rest of the first piece) of a manifest frame's body."""
+    count = int.from_bytes(body[:2], "big")
+    length = int.from_bytes(body[2:10], "big")
+    end = _SVM_FIXED_BYTES + 8 * count
+    if len(body) < end:
+        raise ValueError("Corrupted multi-keyframe manifest.")
+    times = [int.from_bytes(body[i:i + 8], "big", signed=True) / 1e6
+             for i in range(_SVM_FIXED_BYTES, end, 8)]
+    return length, times, body[end:]
+
+
+# -------------------- BACKGROUND JOBS --------------------
+# Long operations run on a thread pool. Tk is only ever touched from the
+# main thread, which drains the jobs' events every _JOB_POLL_MS.
+_JOB_WORKERS = 4
+_JOB_POLL_MS = 50
+
+
+class JobCancelled(Exception):
+    """Raised by Job.check() once the job has been cancelled."""
+
+
+class Job:
+    """
+    One background operation, as seen by its work function: report with
+    progress() and call check() between steps so a cancel takes effect.
+    Work that can't poll, such as a VideoPipeline, hooks on_cancel().
+    """
+
+    def __init__(self, name, events):
+        self.name = name
+        self._events = events
+        self._cancel = threading.Event()
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._cancel.set()
+            hooks, self._hooks = self._hooks, []
+        for hook in hooks:
+            hook()
+
+    def on_cancel(self, hook):
+        """Call hook on cancel, from whichever thread cancels; now if already cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._hooks.append(hook)
+                return
+        hook()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def progress(self, fraction=None, text=""):
+        """Report how far along the job is, 0..1; None when it can't tell."""
+        self._events.put((self, "progress", (fraction, text)))
+
+
+class JobRunner:
+    """
+    Run work(job) functions on a thread pool, at most one per name (one per
+    tab), and hand their progress and outcome to callbacks on the Tk thread
+    through after() polling. A cancelled job's result or error is dropped.
+    """
+
+    def __init__(self, widget, workers=_JOB_WORKERS):
+        self._widget = widget
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._events = queue.Queue()
+        self._jobs = {}  # name -> (job, callbacks)
+        self._polling = False
+
+    def running(self, name):
+        return name in self._jobs
+
+    def start(self, name, work, done, failed, progress=None, finished=None):
+        """
+        Run work(job) in the background. On the Tk thread, progress(fraction,
+        text) follows its reports, then finished(outcome) gets "done",
+        "failed" or "cancelled" and done(result) / failed(error) follow.
+        """
+        if self.running(name):
+            raise ValueError("A job is already running here.")
+        job = Job(name, self._events)
+        self._jobs[name] = (job, (done, failed, progress, finished))
+        self._pool.submit(self._run, job, work)
+        if not self._polling:
+            self._polling = True
+            self._widget.after(_JOB_POLL_MS, self._poll)
+        return job
+
+    def cancel(self, name):
+        if name in self._jobs:
+            self._jobs[name][0].cancel()
+
+    def cancel_all(self):
+        for job, _ in list(self._jobs.values()):
+            job.cancel()
+
+    def _run(self, job, work):
+        try:
+            self._events.put((job, "done", work(job)))
+        except Exception as e:
+            self._events.put((job, "failed", e))
+
+    def _poll(self):
+        while True:
+            try:
+                job, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            entry = self._jobs.get(job.name)
+            if entry is None or entry[0] is not job:
+                continue  # late report from a job already wound up
+            done, failed, progress, finished = entry[1]
+            if kind == "progress":
+                if progress and not job.cancelled:
+                    progress(*value)
+                continue
+            del self._jobs[job.name]
+            outcome = "cancelled" if job.cancelled else kind
+            if finished:
+                finished(outcome)
+            if outcome == "done":
+                done(value)
+            elif outcome == "failed":
+                failed(value)
+        if self._jobs:
+            self._widget.after(_JOB_POLL_MS, self._poll)
+        else:
+            self._polling = False
 
 
 class DropZone(tk.Frame):
@@ -81,6 +2255,44 @@ class DropZone(tk.Frame):
         self.label.configure(bg=self.default_bg, text=self.default_text)
 
 
+class JobBar(tk.Frame):
+    """Progress bar, status line and cancel button for one tab's background job."""
+
+    def __init__(self, parent, on_cancel):
+        super().__init__(parent, bg='#f5f5f5')
+        self.bar = ttk.Progressbar(self, length=260, maximum=1.0)
+        self.bar.pack(side=tk.LEFT, padx=(10, 5))
+        self.cancel_button = tk.Button(self, text="✖ Cancel", command=on_cancel,
+                                       bg='#F44336', fg='white', state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.status = tk.Label(self, text="", bg='#f5f5f5',
+                               font=('Helvetica', 10, 'italic'))
+        self.status.pack(side=tk.LEFT, padx=5)
+
+    def start(self):
+        self.update_progress(None, "Working…")
+        self.cancel_button.config(state=tk.NORMAL)
+
+    def update_progress(self, fraction, text=""):
+        if fraction is None:
+            if str(self.bar.cget("mode")) != "indeterminate":
+                self.bar.config(mode="indeterminate")
+                self.bar.start(15)
+        else:
+            self.bar.stop()
+            self.bar.config(mode="determinate", value=min(max(fraction, 0.0), 1.0))
+        if text:
+            self.status.config(text=text)
+
+    def finish(self, outcome):
+        self.bar.stop()
+        self.bar.config(mode="determinate",
+                        value=1.0 if outcome == "done" else 0.0)
+        self.status.config(text={"done": "Done", "failed": "Failed",
+                                 "cancelled": "Cancelled"}[outcome])
+        self.cancel_button.config(state=tk.DISABLED)
+
+
 class KeyLsbDialog(tk.Toplevel):
     def __init__(self, parent, title="Enter Credentials"):
         super().__init__(parent)
@@ -162,6 +2374,9 @@ class StegApp(TkinterDnD.Tk):
         self.num_lsbs = tk.IntVar(value=1)
         self.payload_type = tk.StringVar(value="file")
         self.payload_text = tk.StringVar()
+        self.image_format = tk.StringVar(value="STG3")
+        self.image_workers = tk.IntVar(value=os.cpu_count() or 1)
+        self.image_output = tk.StringVar(value="png-balanced")
 
         self.audio_cover_path = tk.StringVar()
         self.audio_payload_path = tk.StringVar()
@@ -173,6 +2388,10 @@ class StegApp(TkinterDnD.Tk):
         self.audio_num_lsbs = tk.IntVar(value=1)
         self.audio_payload_type = tk.StringVar(value="file")
         self.audio_payload_text = tk.StringVar()
+        self.audio_block_mode = tk.BooleanVar(value=False)
+        # Audio encode: (start, end) frame range dragged on the cover waveform
+        self.audio_embed_range = None
+        self.audio_range_start_x = None
         self.show_key = tk.BooleanVar(value=False)
         self.show_audio_key = tk.BooleanVar(value=False)
 
@@ -187,6 +2406,9 @@ class StegApp(TkinterDnD.Tk):
         self.video_decode_stego_path = tk.StringVar()
         self.video_secret_key = tk.StringVar()
         self.video_num_lsbs = tk.IntVar(value=1)
+        self.video_splice_mode = tk.BooleanVar(value=False)
+        self.video_spread_mode = tk.BooleanVar(value=False)
+        self.video_output = tk.StringVar(value="ffv1-mt")
         self.video_payload_type = tk.StringVar(value="file")
         self.video_payload_text = tk.StringVar()
         self.show_video_key = tk.BooleanVar(value=False)
@@ -201,6 +2423,11 @@ class StegApp(TkinterDnD.Tk):
         self.start_canvas_x = None
         self.start_canvas_y = None
 
+        # Background jobs: at most one per tab, shown on that tab's JobBar
+        self._jobs = JobRunner(self)
+        self._job_bars = {}
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+
         self.setup_ui()
 
     def setup_ui(self):
@@ -244,6 +2471,29 @@ class StegApp(TkinterDnD.Tk):
         self.setup_video_encode_tab(video_encode_frame)
         self.setup_video_decode_tab(video_decode_frame)
 
+    def _add_job_bar(self, parent, tab):
+        bar = JobBar(parent, on_cancel=lambda: self._jobs.cancel(tab))
+        bar.pack(side=tk.LEFT, padx=10)
+        self._job_bars[tab] = bar
+
+    def _start_job(self, tab, work, done, failed):
+        """
+        Run work(job) off the Tk thread, shown on tab's JobBar; done(result)
+        or failed(error) then run on the Tk thread. Cancelled jobs call neither.
+        """
+        if self._jobs.running(tab):
+            messagebox.showinfo(
+                "Busy", "This tab is still working. Wait for it or cancel it first.")
+            return
+        bar = self._job_bars[tab]
+        bar.start()
+        self._jobs.start(tab, work, done, failed,
+                         progress=bar.update_progress, finished=bar.finish)
+
+    def _on_close(self):
+        self._jobs.cancel_all()
+        self.destroy()
+
     def create_scrolled_frame(self, parent):
         canvas = tk.Canvas(parent, bg='#f5f5f5')
         scrollbar = ttk.Scrollbar(
@@ -365,6 +2615,29 @@ class StegApp(TkinterDnD.Tk):
                                        font=('Helvetica', 10, 'italic'), bg='#f5f5f5')
         self.capacity_label.pack(side=tk.LEFT, padx=20)
 
+        format_frame = tk.Frame(config_frame, bg='#f5f5f5')
+        format_frame.pack(fill=tk.X, pady=2)
+
+        tk.Label(format_frame, text="Format:", font=('Helvetica', 10, 'bold'),
+                 bg='#f5f5f5').pack(side=tk.LEFT)
+        tk.Radiobutton(format_frame, text="STG3 (keyed, fast)", variable=self.image_format,
+                       value="STG3", bg='#f5f5f5',
+                       font=('Helvetica', 10)).pack(side=tk.LEFT, padx=10)
+        tk.Radiobutton(format_frame, text="STG2 (legacy)", variable=self.image_format,
+                       value="STG2", bg='#f5f5f5',
+                       font=('Helvetica', 10)).pack(side=tk.LEFT, padx=10)
+
+        tk.Label(format_frame, text="Workers:", font=('Helvetica', 10, 'bold'),
+                 bg='#f5f5f5').pack(side=tk.LEFT, padx=(20, 0))
+        tk.Spinbox(format_frame, from_=1, to=max(64, os.cpu_count() or 1), width=4,
+                   textvariable=self.image_workers,
+                   font=('Helvetica', 10)).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(format_frame, text="Output:", font=('Helvetica', 10, 'bold'),
+                 bg='#f5f5f5').pack(side=tk.LEFT, padx=(20, 0))
+        ttk.Combobox(format_frame, textvariable=self.image_output, state="readonly",
+                     values=list(_OUTPUT_PROFILES), width=13).pack(side=tk.LEFT, padx=5)
+
         button_frame = tk.Frame(inner_frame, bg='#f5f5f5')
         button_frame.pack(fill=tk.X, padx=10, pady=10)
 
@@ -375,6 +2648,7 @@ class StegApp(TkinterDnD.Tk):
         tk.Button(button_frame, text="🗑️ Clear All", bg="#FF9800", fg="white",
                   font=("Helvetica", 12, "bold"), command=self.clear_all,
                   height=2, width=15).pack(side=tk.LEFT, padx=10)
+        self._add_job_bar(button_frame, "image_encode")
 
         display_frame = tk.LabelFrame(inner_frame, text="Image Display",
                                       font=('Helvetica', 10, 'bold'), bg='#f5f5f5')
@@ -488,10 +2762,11 @@ class StegApp(TkinterDnD.Tk):
             pass
 
     def display_image_on_canvas(self, path, canvas, label=None, overlay=False):
+        # path may also be an already loaded PIL image (e.g. a video frame)
         if not overlay:
             canvas.delete("all")
         try:
-            img = Image.open(path)
+            img = path if isinstance(path, Image.Image) else Image.open(path)
             photo = ImageTk.PhotoImage(img)
             canvas.create_image(0, 0, anchor=tk.NW, image=photo)
             canvas.image = photo
@@ -606,6 +2881,10 @@ class StegApp(TkinterDnD.Tk):
                                              font=('Helvetica', 10, 'italic'), bg='#f5f5f5')
         self.audio_capacity_label.pack(side=tk.LEFT, padx=20)
 
+        tk.Checkbutton(config_frame, text="Block-local permutation (SAB1, streamable)",
+                       variable=self.audio_block_mode, bg='#f5f5f5',
+                       font=('Helvetica', 10)).pack(anchor=tk.W, pady=2)
+
         info_frame = tk.LabelFrame(inner_frame, text="Audio Information",
                                    font=('Helvetica', 10, 'bold'), bg='#f5f5f5',
                                    padx=10, pady=10)
@@ -648,10 +2927,25 @@ class StegApp(TkinterDnD.Tk):
         self.audio_canvas_cover = tk.Canvas(
             vis_frame, width=540, height=canv_height, bg="#ffffff", bd=1, relief=tk.SUNKEN)
         self.audio_canvas_cover.pack(side=tk.LEFT, padx=5, pady=5)
+        self.audio_canvas_cover.bind(
+            "<ButtonPress-1>", self.on_audio_range_press)
+        self.audio_canvas_cover.bind("<B1-Motion>", self.on_audio_range_drag)
+        self.audio_canvas_cover.bind(
+            "<ButtonRelease-1>", self.on_audio_range_release)
         self.audio_canvas_stego = tk.Canvas(
             vis_frame, width=540, height=canv_height, bg="#ffffff", bd=1, relief=tk.SUNKEN)
         self.audio_canvas_stego.pack(side=tk.LEFT, padx=5, pady=5)
 
+        range_frame = tk.Frame(inner_frame, bg='#f5f5f5')
+        range_frame.pack(fill=tk.X, padx=20)
+        self.audio_range_label = tk.Label(
+            range_frame, text="Embed range: whole file (drag on the cover waveform to select)",
+            bg="#f5f5f5", font=("Helvetica", 10, "italic"))
+        self.audio_range_label.pack(side=tk.LEFT)
+        tk.Button(range_frame, text="Clear Range", bg="#9E9E9E", fg="white",
+                  font=("Helvetica", 9, "bold"),
+                  command=self.clear_audio_range).pack(side=tk.LEFT, padx=10)
+
         self.audio_flip_label = tk.Label(
             inner_frame, text="LSB flips: N/A", bg="#f5f5f5", font=("Helvetica", 10, "italic"))
         self.audio_flip_label.pack(anchor=tk.W, padx=20, pady=(0, 10))
@@ -666,6 +2960,7 @@ class StegApp(TkinterDnD.Tk):
         tk.Button(button_frame, text="🗑️ Clear All", bg="#FF9800", fg="white",
                   font=("Helvetica", 12, "bold"), command=self.clear_audio_all,
                   height=2, width=15).pack(side=tk.LEFT, padx=10)
+        self._add_job_bar(button_frame, "audio_encode")
 
         self.toggle_audio_payload_input()
 
@@ -844,6 +3139,21 @@ class StegApp(TkinterDnD.Tk):
                                              font=('Helvetica', 10, 'italic'), bg='#f5f5f5')
         self.video_capacity_label.pack(side=tk.LEFT, padx=20)
 
+        tk.Checkbutton(config_frame, text="GOP splice (re-encode one GOP, copy the rest; FFV1 RGB covers)",
+                       variable=self.video_splice_mode, bg='#f5f5f5',
+                       font=('Helvetica', 10)).pack(anchor=tk.W, pady=2)
+        tk.Checkbutton(config_frame, text="Spread payload across keyframes (SVM1)",
+                       variable=self.video_spread_mode, bg='#f5f5f5',
+                       command=self.update_video_capacity_display,
+                       font=('Helvetica', 10)).pack(anchor=tk.W, pady=2)
+
+        output_frame = tk.Frame(config_frame, bg='#f5f5f5')
+        output_frame.pack(fill=tk.X, pady=2)
+        tk.Label(output_frame, text="Output:", font=('Helvetica', 10, 'bold'),
+                 bg='#f5f5f5').pack(side=tk.LEFT)
+        ttk.Combobox(output_frame, textvariable=self.video_output, state="readonly",
+                     values=list(_VIDEO_PROFILES), width=14).pack(side=tk.LEFT, padx=5)
+
         info_frame = tk.LabelFrame(inner_frame, text="Video Information",
                                    font=('Helvetica', 10, 'bold'), bg='#f5f5f5',
                                    padx=10, pady=10)
@@ -894,6 +3204,7 @@ class StegApp(TkinterDnD.Tk):
         tk.Button(button_frame, text="🗑️ Clear All", bg="#FF9800", fg="white",
                   font=("Helvetica", 12, "bold"), command=self.clear_video_all,
                   height=2, width=15).pack(side=tk.LEFT, padx=10)
+        self._add_job_bar(button_frame, "video_encode")
 
         self.toggle_video_payload_input()
 
@@ -968,6 +3279,7 @@ class StegApp(TkinterDnD.Tk):
     def set_audio_cover(self, path):
         self.audio_cover_path.set(path)
         self.audio_cover_drop_zone.update_text(os.path.basename(path))
+        self.clear_audio_range()
         self.update_audio_info()
         self.update_audio_capacity_display()
         self.update_audio_visuals()
@@ -1084,8 +3396,8 @@ class StegApp(TkinterDnD.Tk):
                 text="Select an audio file to view information")
             return
         try:
-            with wave.open(path, 'rb') as wav:
-                params = wav.getparams()
+            with _WavFile(path) as wav:
+                params = wav.params
                 duration = params.nframes / params.framerate
                 info = f"Duration: {duration:.2f} s | Sample Rate: {params.framerate} Hz | "
                 info += f"Channels: {params.nchannels} | Bit Depth: {params.sampwidth * 8} bits"
@@ -1112,55 +3424,13 @@ class StegApp(TkinterDnD.Tk):
             self.video_info_label.config(text=f"Error reading video info: {e}")
 
     def get_video_params(self, video_path):
-        if shutil.which("ffprobe") is None:
-            raise ValueError("FFprobe not found. Please install FFmpeg.")
-
-        # Get stream info (width, height, fps)
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-select_streams", "v:0",
-             "-show_entries", "stream=width,height,r_frame_rate",
-             "-of", "json", video_path],
-            capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            raise ValueError("Failed to get video stream info.")
-            raise ValueError("Failed to get video stream info.")
-        data = json.loads(result.stdout)
-        if not data.get("streams"):
-            raise ValueError("No video stream found.")
-        stream = data["streams"][0]
-        width = int(stream.get("width", 0))
-        height = int(stream.get("height", 0))
-        fps_frac = stream.get("r_frame_rate", "0/1")
-        fps = eval(fps_frac) if '/' in fps_frac else float(fps_frac)
-
-        # Get overall duration from format level (more reliable for MKV/MP4)
-        result_format = subprocess.run(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
-             "-of", "json", video_path],
-            capture_output=True, text=True
-        )
-        if result_format.returncode != 0:
-            raise ValueError("Failed to get video duration.")
-        format_data = json.loads(result_format.stdout)
-        duration = float(format_data.get("format", {}).get("duration", 0))
-
-        # Count I-frames (unchanged)
-        result_frames = subprocess.run(
-            ["ffprobe", "-v", "error", "-select_streams", "v:0",
-             "-show_entries", "frame=pict_type", "-of", "json", video_path],
-            capture_output=True, text=True
-        )
-        frames_data = json.loads(result_frames.stdout)
-        i_frame_count = sum(1 for f in frames_data.get(
-            "frames", []) if f.get("pict_type") == "I")
-
+        probe = VideoProbe.of(video_path)
         return {
-            'width': width,
-            'height': height,
-            'fps': fps,
-            'duration': duration,
-            'i_frame_count': i_frame_count
+            'width': probe.width,
+            'height': probe.height,
+            'fps': float(probe.fps),
+            'duration': probe.duration,
+            'i_frame_count': probe.keyframe_count
         }
 
     # -------------------- PLAY FUNCTIONS --------------------
@@ -1207,6 +3477,7 @@ class StegApp(TkinterDnD.Tk):
         stego_path = self.audio_stego_path.get()
         if cover_path:
             self._draw_waveform(self.audio_canvas_cover, cover_path, "Cover")
+            self._draw_audio_range()
         if stego_path:
             self._draw_waveform(self.audio_canvas_stego, stego_path, "Stego")
             flips = self._calculate_lsb_flips(
@@ -1222,47 +3493,40 @@ class StegApp(TkinterDnD.Tk):
         if not cover_path:
             return
         try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                cover_iframe = self._extract_first_iframe(
-                    cover_path, tmpdir, "cover_iframe.png")
+            cover_iframe = self._extract_first_iframe(cover_path)
+            self.display_image_on_canvas(
+                Image.fromarray(cover_iframe), self.video_canvas_cover)
+            if stego_path:
+                stego_iframe = self._extract_stego_frame(stego_path)
+                self.display_image_on_canvas(
+                    Image.fromarray(stego_iframe), self.video_canvas_stego)
+                if cover_iframe.shape != stego_iframe.shape:
+                    raise ValueError("Images must have the same dimensions")
                 self.display_image_on_canvas(
-                    cover_iframe, self.video_canvas_cover)
-                if stego_path:
-                    stego_iframe = self._extract_first_iframe(
-                        stego_path, tmpdir, "stego_iframe.png")
-                    self.display_image_on_canvas(
-                        stego_iframe, self.video_canvas_stego)
-                    diff_path = self._create_difference_map(
-                        cover_iframe, stego_iframe)
-                    self.display_image_on_canvas(
-                        diff_path, self.video_canvas_stego, overlay=True)
-                    flips = self._calculate_lsb_flips_image(
-                        cover_iframe, stego_iframe, self.video_num_lsbs.get())
-                    self.video_flip_label.config(
-                        text=f"LSB flips (first I-frame): {flips}")
-                else:
-                    self.video_canvas_stego.delete("all")
-                    self.video_flip_label.config(text="LSB flips: N/A")
+                    self._difference_image(cover_iframe, stego_iframe),
+                    self.video_canvas_stego, overlay=True)
+                flips = self._count_lsb_flips(
+                    cover_iframe, stego_iframe, self.video_num_lsbs.get())
+                self.video_flip_label.config(
+                    text=f"LSB flips (stego frame): {flips}")
+            else:
+                self.video_canvas_stego.delete("all")
+                self.video_flip_label.config(text="LSB flips: N/A")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to update visuals: {e}")
 
-    def _extract_first_iframe(self, video_path, tmpdir, output_name):
-        output_path = os.path.join(tmpdir, output_name)
-        subprocess.check_call(
-            ["ffmpeg", "-i", video_path, "-vf",
-                "select='eq(pict_type\\,I)'", "-vsync", "vfr", "-frames:v", "1", output_path],
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-        return output_path
+    def _extract_first_iframe(self, video_path):
+        return _read_first_iframe(video_path)
+
+    def _extract_stego_frame(self, video_path):
+        return _read_stego_frame(video_path)
 
     def _draw_waveform(self, canvas, audio_path, title):
         canvas.delete("all")
         try:
-            with wave.open(audio_path, 'rb') as wav:
-                params = wav.getparams()
-                frames = wav.readframes(params.nframes)
-                data = np.frombuffer(
-                    frames, dtype=np.int16 if params.sampwidth == 2 else np.int8)
+            with _WavFile(audio_path) as wav:
+                params = wav.params
+                data = wav.samples() if params.sampwidth == 2 else wav.data.view(np.int8)
             width, height = canvas.winfo_width(), canvas.winfo_height()
             canvas.create_text(width/2, 10, text=title)
             if len(data) == 0:
@@ -1282,17 +3546,13 @@ class StegApp(TkinterDnD.Tk):
 
     def _calculate_lsb_flips(self, cover_path, stego_path, num_lsbs):
         try:
-            with wave.open(cover_path, 'rb') as c_wav, wave.open(stego_path, 'rb') as s_wav:
-                c_params = c_wav.getparams()
-                s_params = s_wav.getparams()
-                if c_params != s_params:
+            with _WavFile(cover_path) as c_wav, _WavFile(stego_path) as s_wav:
+                if c_wav.params != s_wav.params:
                     return "N/A (mismatch)"
-                c_data = np.frombuffer(c_wav.readframes(
-                    c_params.nframes), dtype=np.int16 if c_params.sampwidth == 2 else np.int8)
-                s_data = np.frombuffer(s_wav.readframes(
-                    s_params.nframes), dtype=np.int16 if s_params.sampwidth == 2 else np.int8)
-            mask = (1 << num_lsbs) - 1
-            flips = np.sum((c_data & mask) != (s_data & mask))
+                # num_lsbs <= 8 lives entirely in each sample's low byte
+                mask = (1 << num_lsbs) - 1
+                flips = np.count_nonzero(
+                    (c_wav.low_bytes() & mask) != (s_wav.low_bytes() & mask))
             return flips
         except Exception:
             return "N/A"
@@ -1303,19 +3563,16 @@ class StegApp(TkinterDnD.Tk):
             stego_img = Image.open(stego_path).convert('RGB')
             if cover_img.size != stego_img.size:
                 return "N/A (mismatch)"
-            width, height = cover_img.size
-            cp, sp = cover_img.load(), stego_img.load()
-            flips = 0
-            mask = (1 << num_lsbs) - 1
-            for y in range(height):
-                for x in range(width):
-                    for ch in range(3):
-                        if (cp[x, y][ch] & mask) != (sp[x, y][ch] & mask):
-                            flips += 1
-            return flips
+            return self._count_lsb_flips(
+                np.asarray(cover_img), np.asarray(stego_img), num_lsbs)
         except Exception:
             return "N/A"
 
+    def _count_lsb_flips(self, cover, stego, num_lsbs):
+        """Channels whose low num_lsbs bits differ between two equal-shape uint8 arrays."""
+        mask = (1 << num_lsbs) - 1
+        return int(np.count_nonzero((cover & mask) != (stego & mask)))
+
     # -------------------- RUN ENCODE/DECODE --------------------
     def run_encode(self):
         cover_path = self.cover_path.get()
@@ -1346,21 +3603,49 @@ class StegApp(TkinterDnD.Tk):
             payload_data = text.encode('utf-8')
             filename = "text_payload.txt"
 
-        try:
+        magic = self.image_format.get().encode("ascii")
+        workers = self.image_workers.get()
+        output = self.image_output.get()
+
+        def work(job):
+            job.progress(None, "Embedding payload…")
             stego_path = self._encode_image(
-                cover_path, payload_data, filename, key, num_lsbs)
+                cover_path, payload_data, filename, key, num_lsbs,
+                magic=magic, workers=workers, output=output)
+            try:
+                job.check()
+                with _open_strip_reader(stego_path) as probe:
+                    tiled = _needs_tiled(probe.width, probe.height)
+                diff_path = None
+                if not tiled:  # previews would need the whole bitmap in memory
+                    job.progress(None, "Drawing difference map…")
+                    diff_path = self._create_difference_map(cover_path, stego_path)
+                job.check()
+            except JobCancelled:
+                # The embed can't stop midway, so a cancel lands after the
+                # file is written; don't leave it behind
+                os.remove(stego_path)
+                raise
+            return stego_path, diff_path
+
+        def done(result):
+            stego_path, diff_path = result
             self.stego_path.set(stego_path)
-            diff_path = self._create_difference_map(cover_path, stego_path)
-            self.display_image_on_canvas(
-                stego_path, self.stego_canvas, label="Stego")
-            self.display_image_on_canvas(
-                diff_path, self.stego_canvas, label="Difference Map", overlay=False)
+            if diff_path:
+                self.display_image_on_canvas(
+                    stego_path, self.stego_canvas, label="Stego")
+                self.display_image_on_canvas(
+                    diff_path, self.stego_canvas, label="Difference Map", overlay=False)
             messagebox.showinfo(
                 "Success", f"Stego image saved as: {stego_path}")
-        except ValueError as e:
-            messagebox.showerror("Encoding Error", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Unexpected error: {e}")
+
+        def failed(e):
+            if isinstance(e, ValueError):
+                messagebox.showerror("Encoding Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Unexpected error: {e}")
+
+        self._start_job("image_encode", work, done, failed)
 
     def run_decode(self):
         stego_path = filedialog.askopenfilename(title="Select Stego Image", filetypes=[
@@ -1377,7 +3662,7 @@ class StegApp(TkinterDnD.Tk):
 
         try:
             extracted_path, is_text = self._decode_image(
-                stego_path, key, user_lsbs)
+                stego_path, key, user_lsbs, workers=self.image_workers.get())
 
             result_text = f"✅ Payload extracted successfully!\n\n"
             result_text += f"📁 Extracted file: {extracted_path}\n"
@@ -1435,9 +3720,22 @@ class StegApp(TkinterDnD.Tk):
             payload_data = text.encode('utf-8')
             filename = "text_payload.txt"
 
-        try:
+        block_mode = self.audio_block_mode.get()
+
+        def work(job):
+            job.progress(None, "Embedding payload…")
             stego_path = self._encode_audio(
-                cover_path, payload_data, filename, key, num_lsbs)
+                cover_path, payload_data, filename, key, num_lsbs,
+                block_mode=block_mode)
+            try:
+                job.check()
+            except JobCancelled:
+                # Cancelled while embedding: don't leave the file it wrote behind
+                os.remove(stego_path)
+                raise
+            return stego_path
+
+        def done(stego_path):
             self.audio_stego_path.set(stego_path)
             self.btn_play_stego_enc.config(state=tk.NORMAL)
             try:
@@ -1450,10 +3748,14 @@ class StegApp(TkinterDnD.Tk):
 
             messagebox.showinfo(
                 "Success", f"Stego audio saved as: {stego_path}")
-        except ValueError as e:
-            messagebox.showerror("Encoding Error", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Unexpected error: {e}")
+
+        def failed(e):
+            if isinstance(e, ValueError):
+                messagebox.showerror("Encoding Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Unexpected error: {e}")
+
+        self._start_job("audio_encode", work, done, failed)
 
     def run_audio_decode(self):
         stego_path = filedialog.askopenfilename(
@@ -1539,96 +3841,157 @@ class StegApp(TkinterDnD.Tk):
             payload_data = text.encode('utf-8')
             filename = "text_payload.txt"
 
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Extract first I-frame as PNG
-                iframe_path = os.path.join(tmpdir, "iframe.png")
-                result = subprocess.run(
-                    ["ffmpeg", "-i", cover_path, "-vf",
-                        "select='eq(pict_type\\,I)'", "-vsync", "vfr", "-frames:v", "1", iframe_path],
-                    capture_output=True, text=True
-                )
-                if result.returncode != 0:
-                    print(f"I-frame extraction failed:")
-                    print(f"stdout: {result.stdout}")
-                    print(f"stderr: {result.stderr}")
-                    raise subprocess.CalledProcessError(
-                        result.returncode, result.args)
-
-                if not os.path.exists(iframe_path):
-                    raise ValueError("No I-frame found in video.")
-
+        base_name = os.path.splitext(os.path.basename(cover_path))[0]
+        stego_path = os.path.join(os.path.dirname(
+            cover_path), f"stego_{base_name}.mkv")
+        splice = self.video_splice_mode.get()
+        spread = self.video_spread_mode.get()
+        profile = self.video_output.get()
+
+        def work(job):
+            if splice:
+                if spread:
+                    raise ValueError(
+                        "GOP splice carries a single keyframe; turn it off to spread the payload.")
+                # First I-frame, copied: cached frames are shared and read-only
+                job.progress(None, "Embedding into the first I-frame…")
+                frame = self._extract_first_iframe(cover_path).copy()
                 print("I-frame extraction successful")
 
                 # Embed payload into the I-frame using image method (full region)
-                stego_iframe = self._encode_image(
-                    iframe_path, payload_data, filename, key, num_lsbs)
-                print(f"Stego I-frame created: {stego_iframe}")
-
-                # Get video params and frame duration
-                params = self.get_video_params(cover_path)
-                frame_duration = 1 / params['fps']
-                timestamp = self._get_first_iframe_timestamp(cover_path)
-                print(
-                    f"Video params: FPS={params['fps']}, frame_duration={frame_duration}, timestamp={timestamp}")
-
-                # Build filter_complex to replace the I-frame
-                if timestamp == 0:
-                    # First I-frame at start: concat stego frame + rest of video
-                    filter_complex = f"[1:v]setpts=PTS[v2]; [0:v]trim={frame_duration}:,setpts=PTS-STARTPTS[v3]; [v2][v3]concat=n=2:v=1:a=0[v]"
-                else:
-                    # First I-frame not at start: concat before + stego frame + after
-                    filter_complex = f"[0:v]trim=0:{timestamp},setpts=PTS-STARTPTS[v1]; [1:v]setpts=PTS+{timestamp}[v2]; [0:v]trim={timestamp + frame_duration}:,setpts=PTS-STARTPTS[v3]; [v1][v2][v3]concat=n=3:v=1:a=0[v]"
-
-                print(f"Filter complex: {filter_complex}")
-
-                # Re-encode video with stego I-frame inserted, using FFV1 (lossless) in MKV
-                base_name = os.path.splitext(os.path.basename(cover_path))[0]
-                stego_path = os.path.join(os.path.dirname(
-                    cover_path), f"stego_{base_name}.mkv")
-                print(f"Final encoding to: {stego_path}")
-
-                result = subprocess.run(
-                    ["ffmpeg", "-y", "-i", cover_path, "-i", stego_iframe, "-filter_complex", filter_complex,
-                     "-map", "[v]", "-map", "0:a?", "-c:v", "ffv1", "-c:a", "copy", stego_path],
-                    capture_output=True, text=True
-                )
-                if result.returncode != 0:
-                    print(f"Final encoding failed:")
-                    print(f"stdout: {result.stdout}")
-                    print(f"stderr: {result.stderr}")
-                    raise subprocess.CalledProcessError(
-                        result.returncode, result.args)
-
-                print("Final encoding successful")
-
+                self._embed_image_array(
+                    frame, payload_data, filename, key, num_lsbs)
+                job.check()
+
+                # Re-encode only the keyframe's GOP; the rest is stream-copied
+                print(f"Splicing stego GOP into: {stego_path}")
+                job.progress(None, "Splicing stego GOP…")
+                used = _splice_keyframe(cover_path, frame, stego_path)
+                try:
+                    job.check()
+                except JobCancelled:
+                    # The splice can't stop midway; don't leave its output behind
+                    os.remove(stego_path)
+                    raise
+                print("GOP splice successful")
+                return f"GOP splice ({used}): stego keyframe verified bit-exact"
+
+            # Decode, embed and lossless encode run side by side
+            pipeline = VideoPipeline(
+                cover_path, stego_path, profile=profile,
+                progress=lambda fraction: job.progress(fraction, "Encoding frames…"))
+            job.on_cancel(pipeline.cancel)
+            job.progress(0.0, "Encoding frames…")
+            if spread:
+                # Pieces go to key-chosen keyframes, embedded in parallel
+                print(f"Spreading payload across keyframes into: {stego_path}")
+                count = self._encode_video_keyframes(
+                    pipeline, payload_data, filename, key, num_lsbs)
+                print(f"Payload spread over {count} keyframes")
+            else:
+                # Embed payload into the first I-frame (full region)
+                first, = pipeline.frame_indices(
+                    [self._get_first_iframe_timestamp(cover_path)])
+                print(f"Pipelined encoding to: {stego_path}")
+                pipeline.run({first: functools.partial(
+                    self._embed_image_array, payload_data=payload_data,
+                    filename=filename, key=key, num_lsbs=num_lsbs)})
+            print(f"Pipelined encoding wrote {pipeline.frames} frames")
+            try:
+                job.check()
+                # Prove the codec kept every stego frame intact
+                job.progress(None, "Verifying stego frames…")
+                checked = pipeline.verify()
+                job.check()
+            except JobCancelled:
+                # A finished run's output has no stage left for cancel to
+                # kill; don't leave it behind
+                os.remove(stego_path)
+                raise
+            report = f"{pipeline.report()}\nVerified bit-exact: {checked} stego frame(s)"
+            print(report)
+            return report
+
+        def done(report):
             self.video_stego_path.set(stego_path)
             self.btn_play_video_stego_enc.config(state=tk.NORMAL)
 
             self.update_video_visuals()
 
             messagebox.showinfo(
-                "Success", f"Stego video saved as: {stego_path}")
+                "Success", f"Stego video saved as: {stego_path}\n\n{report}")
 
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror(
-                "Error", f"FFmpeg failed during processing. Check console for details.")
-        except ValueError as e:
-            messagebox.showerror("Encoding Error", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Unexpected error: {e}")
+        def failed(e):
+            if isinstance(e, subprocess.CalledProcessError):
+                messagebox.showerror(
+                    "Error", f"FFmpeg failed during processing. Check console for details.")
+            elif isinstance(e, ValueError):
+                messagebox.showerror("Encoding Error", str(e))
+            else:
+                messagebox.showerror("Error", f"Unexpected error: {e}")
+
+        self._start_job("video_encode", work, done, failed)
 
     def _get_first_iframe_timestamp(self, video_path):
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-select_streams", "v:0",
-             "-show_entries", "frame=pts_time,pict_type", "-of", "json", video_path],
-            capture_output=True, text=True
-        )
-        frames = json.loads(result.stdout).get("frames", [])
-        for f in frames:
-            if f.get("pict_type") == "I":
-                return float(f.get("pts_time", 0))
-        return 0.0
+        pts, _ = VideoProbe.of(video_path).keyframes(1)
+        return float(pts[0]) if pts.size and np.isfinite(pts[0]) else 0.0
+
+    def _encode_video_keyframes(self, pipeline, payload_data, filename, key,
+                                num_lsbs):
+        """
+        SVM1: spread the payload over as many keyframes as it needs, chosen by
+        the key, and run the pipeline with one embed per carrier frame.
+        Returns the number of carrier frames.
+        """
+        probe = pipeline.probe
+        pts, _ = probe.keyframes()
+        if not pts.size or not np.isfinite(pts).all():
+            raise ValueError("Could not locate the video's keyframes.")
+        key_hash, _ = self.hash_key(key)
+        fn_len = len(filename.encode("utf-8")[:255])
+        capacity = _svm_frame_capacity(probe.width, probe.height, num_lsbs)
+        count = _svm_frame_count(capacity, len(payload_data), fn_len)
+        if count > pts.size:
+            raise ValueError(
+                f"Payload too large: it needs {count} keyframes, "
+                f"the video has {pts.size}.")
+
+        indices = pipeline.frame_indices(
+            pts[_svm_schedule(key_hash, pts.size, count)])
+        offsets = [pipeline.frame_time(i - indices[0]) for i in indices]
+        pieces = _svm_pieces(payload_data, capacity, fn_len, offsets)
+
+        # Only the manifest frame names the file, and its header marks it
+        pipeline.run({index: functools.partial(
+            self._embed_image_array, payload_data=piece,
+            filename=filename if i == 0 else "", key=key, num_lsbs=num_lsbs,
+            magic=_SVM_MAGIC if i == 0 else b"STG3")
+            for i, (index, piece) in enumerate(zip(indices, pieces))})
+        return count
+
+    def _decode_video_frame(self, stego_path, frame, key, num_lsbs):
+        """
+        (filename, payload) of a stego video, given its decoded header frame.
+        An SVM1 header marks a manifest frame: the other carriers are then
+        read and extracted concurrently. Other frames carry the whole payload.
+        """
+        magic, filename, body = self._decode_image_array(
+            frame, key, num_lsbs, magics=(b"STG2", b"STG3", _SVM_MAGIC))
+        if magic != _SVM_MAGIC:
+            return filename, body
+        length, offsets, head = _svm_read_manifest(body)
+        # Manifest offsets count from the frame that held it
+        first = _stego_frame_time(stego_path)
+
+        def extract(offset):
+            return self._decode_image_array(
+                _read_frame_at(stego_path, first + offset), key, num_lsbs)[2]
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            payload = b"".join([head, *pool.map(extract, offsets[1:])])
+        if len(payload) < length:
+            raise ValueError("Video is missing part of the payload.")
+        return filename, payload[:length]
 
     def run_video_decode(self):
         if shutil.which("ffmpeg") is None:
@@ -1645,19 +4008,13 @@ class StegApp(TkinterDnD.Tk):
 
         self.video_decode_stego_path.set(stego_path)
 
+        # One extraction serves both the preview and the decode; tagged
+        # videos are seeked straight to the stego frame
+        iframe = None
         try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                iframe_path = os.path.join(tmpdir, "stego_iframe.png")
-                subprocess.check_call(
-                    ["ffmpeg", "-i", stego_path, "-vf",
-                        "select='eq(pict_type\\,I)'", "-vsync", "vfr", "-frames:v", "1", iframe_path],
-                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                )
-                if not os.path.exists(iframe_path):
-                    raise ValueError("No I-frame found in video.")
-                self.display_image_on_canvas(
-                    iframe_path, self.video_stego_canvas_dec)
-
+            iframe = self._extract_stego_frame(stego_path)
+            self.display_image_on_canvas(
+                Image.fromarray(iframe), self.video_stego_canvas_dec)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to draw I-frame: {e}")
 
@@ -1669,22 +4026,17 @@ class StegApp(TkinterDnD.Tk):
         key, user_lsbs = dialog.result
 
         try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                iframe_path = os.path.join(tmpdir, "stego_iframe.png")
-                subprocess.check_call(
-                    ["ffmpeg", "-i", stego_path, "-vf",
-                        "select='eq(pict_type\\,I)'", "-vsync", "vfr", "-frames:v", "1", iframe_path],
-                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                )
-                extracted_path, is_text = self._decode_image(
-                    iframe_path, key, user_lsbs)  # Pass user_lsbs
-
-                # Move extracted file to permanent location before temp dir deletion
-                permanent_dir = os.path.dirname(stego_path)
-                permanent_path = os.path.join(
-                    permanent_dir, os.path.basename(extracted_path))
-                shutil.move(extracted_path, permanent_path)
-                extracted_path = permanent_path
+            if iframe is None:
+                iframe = self._extract_stego_frame(stego_path)
+            # SVM1 videos carry the rest of the payload in later keyframes
+            filename, payload = self._decode_video_frame(
+                stego_path, iframe, key, user_lsbs)  # Pass user_lsbs
+
+            extracted_path = os.path.join(os.path.dirname(
+                stego_path), f"extracted_{filename}")
+            with open(extracted_path, "wb") as f:
+                f.write(payload)
+            is_text = filename.endswith(".txt")
 
             result_text = f"✅ Payload extracted successfully!\n\n"
             result_text += f"📁 Extracted file: {extracted_path}\n"
@@ -1750,6 +4102,8 @@ class StegApp(TkinterDnD.Tk):
         if hasattr(self, 'audio_stego_canvas_dec'):
             self.audio_stego_canvas_dec.delete("all")
         self.audio_flip_label.config(text="LSB flips: N/A")
+        self.audio_embed_range = None
+        self._draw_audio_range()
 
         # disable stego button on encode tab
         try:
@@ -1839,129 +4193,224 @@ class StegApp(TkinterDnD.Tk):
             messagebox.showerror("Error", f"Could not open file: {e}")
 
     # -------------------- CORE ENCODERS/DECODERS --------------------
-    def _encode_image(self, cover_path, payload_data, filename, key, num_lsbs):
-        MAGIC = b"STG2"
+    def _encode_image(self, cover_path, payload_data, filename, key, num_lsbs,
+                      magic=b"STG3", workers=1, output="png-balanced"):
+        # STG3: keyed Feistel order, only the used pixels are generated.
+        # STG2: legacy full-region shuffle, kept selectable for old readers.
+        # Covers that need tiling are written as STG4 under STG3; old readers
+        # can't open that, so STG2 refuses them.
+        # workers > 1 splits large bodies across a process pool (same output).
+        # output picks the re-encoded container (see _OUTPUT_PROFILES);
+        # uncompressed covers patched in place keep their own format.
+        if magic not in (b"STG2", b"STG3"):
+            raise ValueError(f"Unsupported image format: {magic!r}")
+        if output not in _OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile: {output}")
+        with _open_strip_reader(cover_path) as probe:
+            if _needs_tiled(probe.width, probe.height):
+                if magic == b"STG2":
+                    raise ValueError(
+                        "This cover is too large for STG2, which old readers "
+                        "need in one piece. Pick STG3 to embed it in strips (STG4).")
+                return self._encode_image_tiled(
+                    cover_path, payload_data, filename, key, num_lsbs, output)
         HEADER_LSBS = 1  # fixed so decode can always read
 
-        key_hash, seed = self.hash_key(key)
-        fn_bytes = filename.encode("utf-8")[:255]
-        fn_len = len(fn_bytes)
+        # Uncompressed BMP/PPM/TIFF covers are copied and patched in place
+        raw = _open_raw_raster(cover_path)
+        image = None if raw else Image.open(cover_path).convert("RGB")
+        width, height = (raw or image).width, (raw or image).height
+        if raw:
+            raw.close()
 
-        with Image.open(cover_path).convert("RGB") as image:
-            width, height = image.size
-            if width > 65535 or height > 65535:
-                raise ValueError("Image too large (dims must fit in uint16).")
+        (hdr_positions, hdr_chunks, body, body_chunks, order, used_px,
+         parallel) = self._image_embed_layout(
+            width, height, payload_data, filename, key, num_lsbs, magic,
+            self.get_embed_region_in_original(), workers)
 
-            reg = self.get_embed_region_in_original()
-            if reg:
-                x1, y1, x2, y2 = reg
+        # 3) Scatter header and body chunks, each in one pass
+        if raw:
+            stego_path = os.path.join(os.path.dirname(
+                cover_path), "stego_" + os.path.basename(cover_path))
+        else:
+            stego_path = _stego_output_path(cover_path, output)
+        if raw:
+            # Only the touched bytes of the copy are written back
+            _fast_copy(cover_path, stego_path)
+            flat = np.memmap(stego_path, dtype=np.uint8, mode="r+")
+            _lsb_embed(flat, raw.byte_offsets(hdr_positions),
+                       hdr_chunks, HEADER_LSBS)
+            if parallel:
+                flat.flush()
+                _run_parallel_lsb(workers, ("file", stego_path, "r+"), order,
+                                  num_lsbs, body_chunks.size, body)
             else:
-                x1 = y1 = x2 = y2 = 0  # sentinel for "full image"
+                _lsb_embed(flat, raw.byte_offsets(_pixel_channel_positions(
+                    used_px)[:body_chunks.size]), body_chunks, num_lsbs)
+                flat.flush()
+            del flat
+        elif parallel:
+            # The bitmap lives in shared memory while the pool writes into it
+            shm, arr = _shared_copy(np.asarray(image, dtype=np.uint8))
+            try:
+                flat = arr.reshape(-1)
+                _lsb_embed(flat, hdr_positions, hdr_chunks, HEADER_LSBS)
+                _run_parallel_lsb(workers, ("shm", shm.name, flat.size), order,
+                                  num_lsbs, body_chunks.size, body)
+                _write_stego_image(stego_path, arr, output, workers)
+            finally:
+                del flat, arr
+                shm.close()
+                shm.unlink()
+        else:
+            # Work on the whole bitmap as one flat channel buffer (R, G, B, R, ...)
+            arr = np.array(image, dtype=np.uint8)
+            flat = arr.reshape(-1)
+            _lsb_embed(flat, hdr_positions, hdr_chunks, HEADER_LSBS)
+            _lsb_embed(flat, _pixel_channel_positions(used_px)[:body_chunks.size],
+                       body_chunks, num_lsbs)
+            _write_stego_image(stego_path, arr, output, workers)
+        return stego_path
 
-            # Fixed header (21 bytes)
-            header = (
-                MAGIC +
-                key_hash[:4] +
-                len(payload_data).to_bytes(4, "big") +
-                bytes([fn_len]) +
-                int(x1).to_bytes(2, "big") + int(y1).to_bytes(2, "big") +
-                int(x2).to_bytes(2, "big") + int(y2).to_bytes(2, "big")
-            )
+    def _image_embed_layout(self, width, height, payload_data, filename, key,
+                            num_lsbs, magic, region, workers=1):
+        """
+        Header and body chunks of an STG2/STG3 embed plus where they go:
+        (hdr_positions, hdr_chunks, body, body_chunks, order, used_px, parallel).
+        used_px is None when the body is left to the parallel workers.
+        """
+        MAGIC = magic
+        HEADER_LSBS = 1  # fixed so decode can always read
 
-            body = fn_bytes + payload_data
+        key_hash, seed = self.hash_key(key)
+        fn_bytes = filename.encode("utf-8")[:255]
+        fn_len = len(fn_bytes)
 
-            hdr_bits = bitarray()
-            hdr_bits.frombytes(header)
-            body_bits = bitarray()
-            body_bits.frombytes(body)
+        if width > 65535 or height > 65535:
+            raise ValueError("Image too large (dims must fit in uint16).")
 
-            pixels = image.load()
-            all_pos = [(x, y) for y in range(height) for x in range(width)]
+        if region:
+            x1, y1, x2, y2 = region
+        else:
+            x1 = y1 = x2 = y2 = 0  # sentinel for "full image"
+
+        # Fixed header (21 bytes)
+        header = (
+            MAGIC +
+            key_hash[:4] +
+            len(payload_data).to_bytes(4, "big") +
+            bytes([fn_len]) +
+            int(x1).to_bytes(2, "big") + int(y1).to_bytes(2, "big") +
+            int(x2).to_bytes(2, "big") + int(y2).to_bytes(2, "big")
+        )
 
-            def embed_bits(positions, bits, per_pixel_lsbs):
-                idx = 0
-                mask_keep = (255 << per_pixel_lsbs) & 255
-                for (x, y) in positions:
-                    if idx >= len(bits):
-                        break
-                    r, g, b = pixels[x, y]
-                    rgb = [r, g, b]
-                    for i in range(3):
-                        if idx >= len(bits):
-                            break
-                        chunk = bits[idx:idx + per_pixel_lsbs]
-                        val = int(chunk.to01().ljust(per_pixel_lsbs, '0'), 2)
-                        rgb[i] = (rgb[i] & mask_keep) | val
-                        idx += per_pixel_lsbs
-                    pixels[x, y] = tuple(rgb)
-                return idx
-
-            # 1) Write header with 1 LSB in raster order
-            header_bits_needed = len(header) * 8
-            hdr_px_needed = (header_bits_needed +
-                             (HEADER_LSBS * 3) - 1) // (HEADER_LSBS * 3)
-            header_pos = all_pos[:hdr_px_needed]
-            if embed_bits(header_pos, hdr_bits, HEADER_LSBS) < len(hdr_bits):
-                raise ValueError("Not enough space for header.")
+        body = fn_bytes + payload_data
 
-            # 2) Prepare body positions (region, minus header pixels)
-            if x1 == y1 == x2 == y2 == 0:
-                region_pos = all_pos
-            else:
-                region_pos = [(x, y) for y in range(y1, y2)
-                              for x in range(x1, x2)]
-            header_set = set(header_pos)
-            region_pos = [p for p in region_pos if p not in header_set]
+        # 1) Header goes into 1 LSB of the first channels, raster order
+        header_bits_needed = len(header) * 8
+        hdr_px_needed = (header_bits_needed +
+                         (HEADER_LSBS * 3) - 1) // (HEADER_LSBS * 3)
+        if width * height * 3 * HEADER_LSBS < header_bits_needed:
+            raise ValueError("Not enough space for header.")
+        hdr_chunks = _lsb_chunks_from_bytes(header, HEADER_LSBS)
+        hdr_positions = np.arange(hdr_chunks.size)
+
+        # 2) Prepare body positions (region, minus header pixels)
+        body_chunks = _lsb_chunks_from_bytes(body, num_lsbs)
+        body_px = (body_chunks.size + 2) // 3
+        rx1, ry1, rx2, _, skip, region_size = _body_region(
+            width, height, x1, y1, x2, y2, hdr_px_needed)
+
+        max_body_bits = region_size * 3 * num_lsbs
+        if len(body) * 8 > max_body_bits:
+            raise ValueError(
+                f"Payload too large for selected region/LSBs: "
+                f"{len(body) * 8} bits > {max_body_bits} bits available"
+            )
 
-            max_body_bits = len(region_pos) * 3 * num_lsbs
-            if len(body_bits) > max_body_bits:
-                raise ValueError(
-                    f"Payload too large for selected region/LSBs: "
-                    f"{len(body_bits)} bits > {max_body_bits} bits available"
-                )
+        # Key-driven permutation over body ordinals
+        parallel = workers > 1 and body_chunks.size >= _PARALLEL_MIN_CHUNKS
+        if MAGIC in (b"STG3", _SVM_MAGIC):
+            order = ("stg3", _feistel_round_keys(key_hash), region_size,
+                     skip, width, rx1, ry1, rx2)
+            # Workers generate their own slice of the order
+            used_px = None if parallel else _range_pixels(order, 0, body_px)
+        else:
+            # Same order as random.shuffle over the legacy region list
+            ordinals = _legacy_shuffle_permutation(
+                region_size, seed)[:body_px]
+            used_px = order = _region_pixels(
+                ordinals + skip, width, rx1, ry1, rx2)
+
+        return (hdr_positions, hdr_chunks, body, body_chunks, order, used_px,
+                parallel)
+
+    def _embed_image_array(self, arr, payload_data, filename, key, num_lsbs,
+                           magic=b"STG3", region=None):
+        """Embed into an (h, w, 3) uint8 frame in place; nothing touches disk."""
+        height, width = arr.shape[:2]
+        hdr_positions, hdr_chunks, _, body_chunks, _, used_px, _ = \
+            self._image_embed_layout(width, height, payload_data, filename,
+                                     key, num_lsbs, magic, region)
+        flat = arr.reshape(-1)
+        _lsb_embed(flat, hdr_positions, hdr_chunks, 1)  # header is always 1 LSB
+        _lsb_embed(flat, _pixel_channel_positions(used_px)[:body_chunks.size],
+                   body_chunks, num_lsbs)
+        return arr
+
+    def _decode_image(self, stego_path, key, num_lsbs, workers=1):
+        # Tiled stego files are read strip by strip; peek at the magic first
+        with _open_strip_reader(stego_path) as probe:
+            if probe.streamable:
+                head = probe.read(-(-11 // probe.width)).reshape(-1)[:32]
+                if np.packbits(head & 1).tobytes() == b"STG4":
+                    return self._decode_image_tiled(stego_path, key, num_lsbs)
+
+        # Uncompressed BMP/PPM/TIFF: gather straight from the file
+        raw = _open_raw_raster(stego_path)
+        if raw:
+            width, height = raw.width, raw.height
+            raw.close()
+            flat = np.memmap(stego_path, dtype=np.uint8, mode="r")
+            locate = raw.byte_offsets
+        else:
+            image = Image.open(stego_path).convert("RGB")
+            width, height = image.size
+            flat = np.asarray(image, dtype=np.uint8).reshape(-1)
+            locate = np.asarray
 
-            # Key-driven permutation
-            random.seed(seed)
-            random.shuffle(region_pos)
-            embed_bits(region_pos, body_bits, num_lsbs)
+        _, filename, payload = self._extract_image_body(
+            flat, locate, width, height, key, num_lsbs, workers,
+            ("file", stego_path, "r") if raw else None)
 
-            stego_path = os.path.join(os.path.dirname(
-                cover_path), "stego_" + os.path.basename(cover_path))
-            image.save(stego_path, "PNG")
-            return stego_path
+        extracted_path = os.path.join(os.path.dirname(
+            stego_path), f"extracted_{filename}")
+        with open(extracted_path, "wb") as f:
+            f.write(payload)
+        is_text = filename.endswith(".txt")
+        return extracted_path, is_text
 
-    def _decode_image(self, stego_path, key, num_lsbs):
-        MAGIC = b"STG2"
+    def _extract_image_body(self, flat, locate, width, height, key, num_lsbs,
+                            workers=1, file_target=None, magics=(b"STG2", b"STG3")):
+        """
+        (magic, filename, payload) of an embed in a flat RGB channel buffer
+        whose header carries one of magics. locate maps channel indices to
+        flat indices; file_target lets parallel workers map the file
+        themselves instead of sharing flat.
+        """
+        MAGICS = magics
         FIXED_HDR_LEN = 21  # Updated: removed 1 byte for body_num_lsbs
         HEADER_LSBS = 1
 
-        image = Image.open(stego_path).convert("RGB")
-        width, height = image.size
-        pixels = image.load()
-
-        all_pos = [(x, y) for y in range(height) for x in range(width)]
         header_bits_needed = FIXED_HDR_LEN * 8
         hdr_px_needed = (header_bits_needed +
                          (HEADER_LSBS * 3) - 1) // (HEADER_LSBS * 3)
-        header_pos = all_pos[:hdr_px_needed]
 
-        def extract_bits(positions, nbits, per_pixel_lsbs):
-            out = bitarray()
-            mask = (1 << per_pixel_lsbs) - 1
-            for (x, y) in positions:
-                if len(out) >= nbits:
-                    break
-                r, g, b = pixels[x, y]
-                for val in (r, g, b):
-                    if len(out) >= nbits:
-                        break
-                    out.extend(bin(val & mask)[2:].zfill(per_pixel_lsbs))
-            return out
-
-        # 1) Read header
-        hdr_bits = extract_bits(header_pos, header_bits_needed, HEADER_LSBS)
-        hdr = hdr_bits.tobytes()[:FIXED_HDR_LEN]
-        if hdr[:4] != MAGIC:
+        # 1) Read header (fast path: 1 LSB of the first 168 channels, raster order)
+        hdr = np.packbits(
+            flat[locate(np.arange(header_bits_needed))] & 1).tobytes()
+        magic = hdr[:4]
+        if magic not in MAGICS:
             raise ValueError(
                 "Unsupported/old stego format or corrupted header.")
 
@@ -1978,24 +4427,228 @@ class StegApp(TkinterDnD.Tk):
         if stored_key_prefix != key_hash[:4]:
             raise ValueError("Wrong secret key.")
 
-        # 2) Region & positions (minus header)
-        if x1 == y1 == x2 == y2 == 0:
-            region_pos = all_pos
-        else:
-            region_pos = [(x, y) for y in range(y1, y2) for x in range(x1, x2)]
-        header_set = set(header_pos)
-        region_pos = [p for p in region_pos if p not in header_set]
+        # 2) Region & positions (minus header)
+        total_body_bits = (filename_len + payload_size) * 8
+        n_chunks = (total_body_bits + num_lsbs - 1) // num_lsbs
+        body_px = (n_chunks + 2) // 3
+        x1, y1, x2, _, skip, region_size = _body_region(
+            width, height, x1, y1, x2, y2, hdr_px_needed)
+        if body_px > region_size:
+            raise ValueError("Incomplete embedded data (region/LSB mismatch).")
+        parallel = workers > 1 and n_chunks >= _PARALLEL_MIN_CHUNKS
+        if magic in (b"STG3", _SVM_MAGIC):
+            # Only the pixels the body actually occupies are generated
+            order = ("stg3", _feistel_round_keys(key_hash), region_size,
+                     skip, width, x1, y1, x2)
+            used_px = None if parallel else _range_pixels(order, 0, body_px)
+        else:
+            ordinals = _legacy_shuffle_permutation(region_size, seed)[:body_px]
+            used_px = order = _region_pixels(ordinals + skip, width, x1, y1, x2)
+
+        # 3) Gather body chunks with user-provided LSBs in one pass
+        if parallel and file_target:
+            chunks = _run_parallel_lsb(workers, file_target, order,
+                                       num_lsbs, n_chunks)
+        elif parallel:
+            shm, shared = _shared_copy(flat)
+            try:
+                chunks = _run_parallel_lsb(workers, ("shm", shm.name, shared.size),
+                                           order, num_lsbs, n_chunks)
+            finally:
+                del shared
+                shm.close()
+                shm.unlink()
+        else:
+            positions = locate(_pixel_channel_positions(used_px)[:n_chunks])
+            chunks = _lsb_extract(flat, positions, num_lsbs)
+        body = _lsb_chunks_to_bytes(chunks, num_lsbs, total_body_bits // 8)
+        if len(body) * 8 < total_body_bits:
+            raise ValueError("Incomplete embedded data (region/LSB mismatch).")
+
+        filename = body[:filename_len].decode("utf-8", errors="replace")
+        payload = body[filename_len:filename_len + payload_size]
+        return magic, filename, payload
+
+    def _decode_image_array(self, arr, key, num_lsbs, magics=(b"STG2", b"STG3")):
+        """(magic, filename, payload) from an (h, w, 3) uint8 frame already in memory."""
+        height, width = arr.shape[:2]
+        return self._extract_image_body(
+            np.ascontiguousarray(arr).reshape(-1), np.asarray, width, height,
+            key, num_lsbs, magics=magics)
+
+    def _encode_image_tiled(self, cover_path, payload_data, filename, key, num_lsbs,
+                            output="png-balanced"):
+        # STG4: covers too large for one bitmap (or for uint16 coordinates) are
+        # streamed in image-aligned strips, each with its own keyed permutation.
+        # Output is always a streamed PNG; BMP/TIFF profiles use balanced PNG.
+        MAGIC = b"STG4"
+        FIXED_HDR_LEN = 33  # 32-bit region coordinates plus rows per strip
+        HEADER_LSBS = 1
+
+        key_hash, _ = self.hash_key(key)
+        fn_bytes = filename.encode("utf-8")[:255]
+        body = fn_bytes + payload_data
+        hdr_px_needed = (FIXED_HDR_LEN * 8 +
+                         (HEADER_LSBS * 3) - 1) // (HEADER_LSBS * 3)
+
+        with _open_strip_reader(cover_path) as reader:
+            if not reader.streamable:  # JPEG etc. would be decoded whole
+                raise ValueError(_TILED_FORMATS_ERROR)
+            width, height = reader.width, reader.height
+            if width * height < hdr_px_needed:
+                raise ValueError("Not enough space for header.")
+
+            reg = self.get_embed_region_in_original()
+            x1, y1, x2, y2 = reg if reg else (0, 0, 0, 0)
+            tile_rows = _tile_rows_for(width, height, hdr_px_needed)
+            header = (
+                MAGIC +
+                key_hash[:4] +
+                len(payload_data).to_bytes(4, "big") +
+                bytes([len(fn_bytes)]) +
+                b"".join(int(v).to_bytes(4, "big")
+                         for v in (x1, y1, x2, y2, tile_rows))
+            )
+            if x1 == y1 == x2 == y2 == 0:
+                x1, y1, x2, y2 = 0, 0, width, height
+
+            layout = _tiled_layout(width, height, x1, y1, x2, y2,
+                                   tile_rows, hdr_px_needed)
+            capacities = [strip[3] for strip in layout]
+            max_body_bits = sum(capacities) * 3 * num_lsbs
+            if len(body) * 8 > max_body_bits:
+                raise ValueError(
+                    f"Payload too large for selected region/LSBs: "
+                    f"{len(body) * 8} bits > {max_body_bits} bits available"
+                )
+
+            hdr_chunks = _lsb_chunks_from_bytes(header, HEADER_LSBS)
+            body_chunks = _lsb_chunks_from_bytes(body, num_lsbs)
+            alloc = _tiled_allocation(capacities, (body_chunks.size + 2) // 3)
+
+            stego_path = os.path.join(os.path.dirname(
+                cover_path), "stego_" + os.path.basename(cover_path))
+            if reader.in_place:
+                # Uncompressed cover: patch a copy, no strip is ever decoded
+                _fast_copy(cover_path, stego_path)
+                flat = np.memmap(stego_path, dtype=np.uint8, mode="r+")
+                _lsb_embed(flat, reader.byte_offsets(np.arange(hdr_chunks.size)),
+                           hdr_chunks, HEADER_LSBS)
+                offset = 0
+                for strip, n_used in enumerate(alloc):
+                    if not n_used:
+                        continue
+                    used_px = _strip_pixels(strip, n_used, key_hash,
+                                            width, x1, x2, layout)
+                    chunks = body_chunks[offset:offset + n_used * 3]
+                    positions = _pixel_channel_positions(
+                        used_px + strip * tile_rows * width)[:chunks.size]
+                    _lsb_embed(flat, reader.byte_offsets(positions),
+                               chunks, num_lsbs)
+                    offset += chunks.size
+                flat.flush()
+                del flat
+                return stego_path
+
+            kind, level, filters = _OUTPUT_PROFILES[output]
+            if kind != "png":
+                _, level, filters = _OUTPUT_PROFILES["png-balanced"]
+            writer = _PngStripWriter(stego_path, width, height, level, filters)
+            try:
+                offset = 0
+                for strip, n_used in enumerate(alloc):
+                    rows = reader.read(tile_rows)
+                    flat = rows.reshape(-1)
+                    if strip == 0:
+                        _lsb_embed(flat, np.arange(hdr_chunks.size),
+                                   hdr_chunks, HEADER_LSBS)
+                    if n_used:
+                        used_px = _strip_pixels(strip, n_used, key_hash,
+                                                width, x1, x2, layout)
+                        chunks = body_chunks[offset:offset + n_used * 3]
+                        _lsb_embed(flat, _pixel_channel_positions(used_px),
+                                   chunks, num_lsbs)
+                        offset += chunks.size
+                    writer.write(rows)
+            finally:
+                writer.close()
+        return stego_path
+
+    def _decode_image_tiled(self, stego_path, key, num_lsbs):
+        MAGIC = b"STG4"
+        FIXED_HDR_LEN = 33
+        HEADER_LSBS = 1
+        hdr_px_needed = (FIXED_HDR_LEN * 8 +
+                         (HEADER_LSBS * 3) - 1) // (HEADER_LSBS * 3)
 
-        total_body_bits = (filename_len + payload_size) * 8
-        random.seed(seed)
-        random.shuffle(region_pos)
+        with _open_strip_reader(stego_path) as reader:
+            width, height = reader.width, reader.height
 
-        # 3) Extract body with user-provided LSBs
-        body_bits = extract_bits(region_pos, total_body_bits, num_lsbs)
-        if len(body_bits) < total_body_bits:
+            # 1) Header from the first rows only
+            head = reader.read(-(-hdr_px_needed // width))
+            hdr = np.packbits(head.reshape(-1)[:FIXED_HDR_LEN * 8] & 1).tobytes()
+            if hdr[:4] != MAGIC:
+                raise ValueError(
+                    "Unsupported/old stego format or corrupted header.")
+            stored_key_prefix = hdr[4:8]
+            payload_size = int.from_bytes(hdr[8:12], "big")
+            filename_len = hdr[12]
+            x1, y1, x2, y2, tile_rows = (
+                int.from_bytes(hdr[i:i + 4], "big") for i in range(13, 33, 4))
+
+            key_hash, _ = self.hash_key(key)
+            if stored_key_prefix != key_hash[:4]:
+                raise ValueError("Wrong secret key.")
+            if tile_rows < head.shape[0]:
+                raise ValueError("Corrupted tiled header (rows per strip).")
+            if x1 == y1 == x2 == y2 == 0:
+                x1, y1, x2, y2 = 0, 0, width, height
+
+            # 2) Same strip layout and allocation as the encoder
+            total_body_bits = (filename_len + payload_size) * 8
+            n_chunks = (total_body_bits + num_lsbs - 1) // num_lsbs
+            layout = _tiled_layout(width, height, x1, y1, x2, y2,
+                                   tile_rows, hdr_px_needed)
+            capacities = [strip[3] for strip in layout]
+            body_px = (n_chunks + 2) // 3
+            if body_px > sum(capacities):
+                raise ValueError(
+                    "Incomplete embedded data (region/LSB mismatch).")
+            alloc = _tiled_allocation(capacities, body_px)
+
+            # 3) Gather strip by strip, stopping after the last used strip
+            # (uncompressed files are gathered straight from the file)
+            file_bytes = (np.memmap(stego_path, dtype=np.uint8, mode="r")
+                          if reader.in_place else None)
+            parts, gathered = [], 0
+            for strip, n_used in enumerate(alloc):
+                if gathered >= n_chunks:
+                    break
+                if file_bytes is not None:
+                    if n_used:
+                        used_px = _strip_pixels(strip, n_used, key_hash,
+                                                width, x1, x2, layout)
+                        positions = reader.byte_offsets(_pixel_channel_positions(
+                            used_px + strip * tile_rows * width))
+                        parts.append(_lsb_extract(file_bytes, positions, num_lsbs))
+                        gathered += parts[-1].size
+                    continue
+                rows = reader.read(tile_rows - head.shape[0] if strip == 0
+                                   else tile_rows)
+                if strip == 0:
+                    rows = np.concatenate([head, rows])
+                if n_used:
+                    used_px = _strip_pixels(strip, n_used, key_hash,
+                                            width, x1, x2, layout)
+                    parts.append(_lsb_extract(
+                        rows.reshape(-1), _pixel_channel_positions(used_px), num_lsbs))
+                    gathered += parts[-1].size
+
+        chunks = np.concatenate(parts)[:n_chunks] if parts else np.zeros(0, np.uint8)
+        body = _lsb_chunks_to_bytes(chunks, num_lsbs, total_body_bits // 8)
+        if len(body) * 8 < total_body_bits:
             raise ValueError("Incomplete embedded data (region/LSB mismatch).")
 
-        body = body_bits.tobytes()
         filename = body[:filename_len].decode("utf-8", errors="replace")
         payload = body[filename_len:filename_len + payload_size]
 
@@ -2006,183 +4659,247 @@ class StegApp(TkinterDnD.Tk):
         is_text = filename.endswith(".txt")
         return extracted_path, is_text
 
-    def _encode_audio(self, cover_path, payload_data, filename, key, num_lsbs):
+    def _encode_audio(self, cover_path, payload_data, filename, key, num_lsbs,
+                      block_mode=False):
+        frame_range = self.get_audio_embed_range()
+        if block_mode and frame_range:
+            raise ValueError(
+                "Block-local mode can't be combined with a time range.")
+        if block_mode:
+            return self._encode_audio_blocks(
+                cover_path, payload_data, filename, key, num_lsbs)
+        if frame_range:
+            return self._encode_audio_range(
+                cover_path, payload_data, filename, key, num_lsbs, frame_range)
+
         key_hash, seed = self.hash_key(key)
         key_hash = key_hash[:4]  # Use only first 4 bytes for embedding
         metadata = key_hash + len(payload_data).to_bytes(4, 'big') + \
             len(filename).to_bytes(1, 'big') + filename.encode()
         data_to_embed = metadata + payload_data
-        bit_stream = bitarray()
-        bit_stream.frombytes(data_to_embed)
-
-        with wave.open(cover_path, 'rb') as wav_file:
-            params = wav_file.getparams()
-            frames = wav_file.readframes(params.nframes)
-
-        if params.sampwidth == 1:
-            audio_data = np.frombuffer(frames, dtype=np.uint8).copy()
-            max_val, min_val = 255, 0
-        elif params.sampwidth == 2:
-            audio_data = np.frombuffer(frames, dtype=np.uint16).copy()
-            max_val, min_val = 65535, 0
-        elif params.sampwidth == 3:
-            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
-            audio_data = (
-                raw[:, 0].astype(np.uint32)
-                | (raw[:, 1].astype(np.uint32) << 8)
-                | (raw[:, 2].astype(np.uint32) << 16)
-            )
-            audio_data = audio_data & 0xFFFFFF
-            max_val, min_val = 16777215, 0
-        else:
-            raise ValueError(
-                "Unsupported sample width. Only 8, 16, and 24-bit audio supported.")
-
-        max_bits = len(audio_data) * num_lsbs
-        if len(bit_stream) > max_bits:
-            raise ValueError(
-                f"Payload too large: {len(bit_stream)} bits > {max_bits} bits available")
-
-        random.seed(seed)
-        sample_indices = list(range(len(audio_data)))
-        random.shuffle(sample_indices)
-
-        mask = ~((1 << num_lsbs) - 1)
-        bit_index = 0
-        total_bits = len(bit_stream)
-
-        for sample_idx in sample_indices:
-            if bit_index >= total_bits:
-                break
-
-            chunk = bit_stream[bit_index:bit_index + num_lsbs]
-            bits_to_embed = int(chunk.to01().ljust(num_lsbs, '0'), 2)
-
-            original_sample = int(audio_data[sample_idx])
-            modified_sample = (original_sample & mask) | bits_to_embed
-
-            modified_sample = np.clip(modified_sample, min_val, max_val)
-            audio_data[sample_idx] = modified_sample
-            bit_index += num_lsbs
+        total_bits = len(data_to_embed) * 8
 
         stego_path = os.path.join(os.path.dirname(
             cover_path), "stego_" + os.path.basename(cover_path))
 
-        with wave.open(stego_path, "wb") as stego_file:
-            stego_file.setparams(params)
+        with _WavFile(cover_path) as wav:
+            wav.samples()  # rejects unsupported sample widths
+            n_samples = len(wav.low_bytes())
+            max_bits = n_samples * num_lsbs
+            if total_bits > max_bits:
+                raise ValueError(
+                    f"Payload too large: {total_bits} bits > {max_bits} bits available")
 
-            if params.sampwidth == 3:
-                packed = np.zeros((len(audio_data), 3), dtype=np.uint8)
-                vals = audio_data.astype(np.uint32) & 0xFFFFFF
-                packed[:, 0] = vals & 0xFF
-                packed[:, 1] = (vals >> 8) & 0xFF
-                packed[:, 2] = (vals >> 16) & 0xFF
-                stego_file.writeframes(packed.tobytes())
-            else:
-                stego_file.writeframes(audio_data.tobytes())
+            sample_indices = _legacy_shuffle_permutation(n_samples, seed)
+
+            # Pack the stream into num_lsbs-bit symbols and patch them into a
+            # copy of the cover: only the low bytes of the carrying samples are
+            # written back, every other byte (and chunk) comes from the copy.
+            chunks = _lsb_chunks_from_bytes(data_to_embed, num_lsbs)
+            _fast_copy(cover_path, stego_path)
+            flat = np.memmap(stego_path, dtype=np.uint8, mode="r+")
+            _lsb_embed(flat, wav.byte_offsets(sample_indices[:chunks.size]),
+                       chunks, num_lsbs)
+            flat.flush()
+            del flat
 
         return stego_path
 
     def _decode_audio(self, stego_path, key, num_lsbs):
-        with wave.open(stego_path, 'rb') as wav_file:
-            params = wav_file.getparams()
-            frames = wav_file.readframes(params.nframes)
-
-        if params.sampwidth == 1:
-            audio_data = np.frombuffer(frames, dtype=np.uint8)
-            max_val = 0xFF
-        elif params.sampwidth == 2:
-            audio_data = np.frombuffer(frames, dtype=np.int16)
-            max_val = 0xFFFF
-        elif params.sampwidth == 3:
-            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
-            audio_data = (raw[:, 0].astype(np.uint32) |
-                          (raw[:, 1].astype(np.uint32) << 8) |
-                          (raw[:, 2].astype(np.uint32) << 16))
-            audio_data = audio_data & 0xFFFFFF
-            max_val = 0xFFFFFF
-        else:
-            raise ValueError(
-                "Unsupported sample width. Only 8, 16, and 24-bit audio supported.")
+        # Closed on the way out: a live mapping would keep the WAV from
+        # being replaced or deleted on Windows
+        with _WavFile(stego_path) as wav:
+            return self._decode_audio_wav(wav, key, num_lsbs)
+
+    def _decode_audio_wav(self, wav, key, num_lsbs):
+        wav.samples()  # rejects unsupported sample widths
+        # num_lsbs <= 8 only ever touches the low (first, little-endian) byte
+        low_bytes = wav.low_bytes()
+        if _sab_read_header(low_bytes[:_SAB_HEADER_BITS]) is not None:
+            return self._decode_audio_blocks(wav, key, num_lsbs)
+        range_header = _sar_read_header(low_bytes[:_SAR_HEADER_BITS])
+        if range_header is not None:
+            return self._decode_audio_range(wav, key, num_lsbs, range_header)
 
         key_hash, seed = self.hash_key(key)
         key_hash = key_hash[:4]  # Use only first 4 bytes for comparison
-        random.seed(seed)
-        sample_indices = list(range(len(audio_data)))
-        random.shuffle(sample_indices)
-
-        extracted_bits = bitarray(endian='big')
-        mask = (1 << num_lsbs) - 1
-
-        # Extract enough bits for metadata (4 bytes key hash + 4 bytes payload size + 1 byte filename length)
-        bits_needed = (4 + 4 + 1) * 8
-        samples_needed = (bits_needed + num_lsbs - 1) // num_lsbs
-        samples_needed = min(samples_needed, len(audio_data))
-
-        for i in range(samples_needed):
-            sample_idx = sample_indices[i]
-            sample_value = int(audio_data[sample_idx]) & max_val
-            extracted_bits.extend(bin(sample_value & mask)[2:].zfill(num_lsbs))
+        sample_indices = _legacy_shuffle_permutation(len(low_bytes), seed)
+        capacity_bits = len(low_bytes) * num_lsbs
 
-        if len(extracted_bits) < 72:  # 9 bytes * 8 bits
+        # Phase 1: metadata (4 bytes key hash + 4 bytes payload size + 1 byte
+        # filename length) from the first permuted samples in one gather
+        if capacity_bits < 72:  # 9 bytes * 8 bits
             raise ValueError("Insufficient data for metadata")
+        metadata = _lsb_extract_bytes(
+            low_bytes, sample_indices, num_lsbs, 0, 9)
 
-        # Check metadata format
-        stored_key_hash = extracted_bits[:32].tobytes()
-        offset = 32
-        # Updated to show 4-byte hash
-        print(f"Debug: computed key_hash: {key_hash.hex()}")
-        print(f"Debug: extracted stored_key_hash: {stored_key_hash.hex()}")
-        # Now comparable
-        print(
-            f"Debug: stored_key_hash matches key_hash: {stored_key_hash == key_hash}")
-        if len(stored_key_hash) == 4 and stored_key_hash == key_hash:
+        if metadata[:4] == key_hash:
             # New format with key hash
-            payload_size = int(extracted_bits[offset:offset+32].to01(), 2)
-            offset += 32
-            filename_len = int(extracted_bits[offset:offset+8].to01(), 2)
-            offset += 8
+            offset = 72
+            payload_size = int.from_bytes(metadata[4:8], "big")
+            filename_len = metadata[8]
         else:
             # Old format (no key hash) - fallback for compatibility
-            offset = 0
-            payload_size = int(extracted_bits[offset:offset+32].to01(), 2)
-            offset += 32
-            filename_len = int(extracted_bits[offset:offset+8].to01(), 2)
-            offset += 8
-
-        print(f"Debug: extracted payload_size: {payload_size}")
-        print(f"Debug: extracted filename_len: {filename_len}")
+            offset = 40
+            payload_size = int.from_bytes(metadata[:4], "big")
+            filename_len = metadata[4]
 
         if filename_len <= 0 or filename_len > 255:
             raise ValueError(f"Invalid filename length: {filename_len}")
-        if payload_size <= 0 or payload_size > 50 * 1024 * 1024:
+        if payload_size <= 0:
             raise ValueError(f"Invalid payload size: {payload_size}")
+        if offset + (filename_len + payload_size) * 8 > capacity_bits:
+            raise ValueError("Incomplete payload data")
+
+        # Phase 2: exactly the samples the body needs, streamed to disk
+        filename = _lsb_extract_bytes(
+            low_bytes, sample_indices, num_lsbs, offset, filename_len
+        ).decode("utf-8", errors="replace")
+        offset += filename_len * 8
+
+        extracted_path = os.path.join(os.path.dirname(
+            wav.path), f"extracted_{filename}")
+        is_text = filename.endswith(".txt")
+
+        try:
+            with open(extracted_path, "wb") as f:
+                for start in range(0, payload_size, _AUDIO_BLOCK_BYTES):
+                    nbytes = min(_AUDIO_BLOCK_BYTES, payload_size - start)
+                    f.write(_lsb_extract_bytes(low_bytes, sample_indices, num_lsbs,
+                                               offset + start * 8, nbytes))
+        except Exception as e:
+            raise ValueError(f"Failed to save extracted file: {str(e)}")
+
+        return extracted_path, is_text
+
+    def _encode_audio_blocks(self, cover_path, payload_data, filename, key, num_lsbs):
+        """SAB1 layout: patch a copy of the cover one permutation block at a time."""
+        key_hash, _ = self.hash_key(key)
+        stego_path = os.path.join(os.path.dirname(
+            cover_path), "stego_" + os.path.basename(cover_path))
+
+        with _WavFile(cover_path) as wav:
+            wav.samples()  # rejects unsupported sample widths
+            params = wav.params
+        _sab_check_capacity(params.nframes, params.nchannels, num_lsbs,
+                            len(filename.encode()) + len(payload_data))
+
+        frame_bytes = params.nchannels * params.sampwidth
+        _fast_copy(cover_path, stego_path)
+        with _WavFile(stego_path, mode="r+") as stego:
+            def read(start, n_frames):
+                return stego.data[start * frame_bytes:(start + n_frames) * frame_bytes]
+
+            for _ in _sab_embed(read, params.nframes, params.nchannels,
+                                params.sampwidth, key_hash, num_lsbs,
+                                filename, payload_data):
+                pass
+
+        return stego_path
+
+    def _decode_audio_blocks(self, wav, key, num_lsbs):
+        """SAB1 layout: read only the blocks the payload occupies."""
+        key_hash, _ = self.hash_key(key)
+        params = wav.params
+        frame_bytes = params.nchannels * params.sampwidth
+
+        def read(start, n_frames):
+            return wav.data[start * frame_bytes:(start + n_frames) * frame_bytes]
+
+        pieces = _sab_extract(read, params.nframes, params.nchannels,
+                              params.sampwidth, key_hash, num_lsbs)
+        filename = next(pieces)
+
+        extracted_path = os.path.join(os.path.dirname(
+            wav.path), f"extracted_{filename}")
+        is_text = filename.endswith(".txt")
+
+        try:
+            with open(extracted_path, "wb") as f:
+                for piece in pieces:
+                    f.write(piece)
+        except Exception as e:
+            raise ValueError(f"Failed to save extracted file: {str(e)}")
+
+        return extracted_path, is_text
+
+    def _encode_audio_range(self, cover_path, payload_data, filename, key, num_lsbs,
+                            frame_range):
+        """SAR1 layout: the body is permuted over the selected frames only."""
+        key_hash, _ = self.hash_key(key)
+        stego_path = os.path.join(os.path.dirname(
+            cover_path), "stego_" + os.path.basename(cover_path))
+        start_frame, end_frame = frame_range
+        name = filename.encode()
+
+        with _WavFile(cover_path) as wav:
+            wav.samples()  # rejects unsupported sample widths
+            params = wav.params
+            if not 0 <= start_frame < end_frame <= params.nframes:
+                raise ValueError("Selected time range lies outside the audio.")
+            if params.nframes * params.nchannels < _SAR_HEADER_BITS:
+                raise ValueError("Not enough space for header.")
+            first, size = _sar_body_range(
+                params.nchannels, start_frame, end_frame)
+            total_bits = (len(name) + len(payload_data)) * 8
+            max_bits = size * num_lsbs
+            if total_bits > max_bits:
+                raise ValueError(
+                    f"Payload too large: {total_bits} bits > {max_bits} bits available")
 
-        total_bits_needed = offset + filename_len * 8 + payload_size * 8
-        samples_needed = (total_bits_needed + num_lsbs - 1) // num_lsbs
-        samples_needed = min(samples_needed, len(audio_data))
+            header = (
+                _SAR_MAGIC +
+                key_hash[:4] +
+                len(payload_data).to_bytes(8, "big") +
+                len(name).to_bytes(1, "big") +
+                start_frame.to_bytes(8, "big") +
+                end_frame.to_bytes(8, "big")
+            )
+            chunks = _lsb_chunks_from_bytes(name + payload_data, num_lsbs)
+            positions = _sar_positions(key_hash, first, size, 0, chunks.size)
 
-        for i in range(len(extracted_bits) // num_lsbs, samples_needed):
-            sample_idx = sample_indices[i]
-            sample_value = int(audio_data[sample_idx]) & max_val
-            extracted_bits.extend(bin(sample_value & mask)[2:].zfill(num_lsbs))
+            _fast_copy(cover_path, stego_path)
+            flat = np.memmap(stego_path, dtype=np.uint8, mode="r+")
+            _lsb_embed(flat, wav.byte_offsets(np.arange(_SAR_HEADER_BITS)),
+                       _lsb_chunks_from_bytes(header, 1), 1)
+            _lsb_embed(flat, wav.byte_offsets(positions), chunks, num_lsbs)
+            flat.flush()
+            del flat
 
-        filename_bits = extracted_bits[offset:offset + filename_len * 8]
-        filename = filename_bits.tobytes().decode("utf-8", errors="replace")
+        return stego_path
 
-        payload_bits = extracted_bits[offset + filename_len *
-                                      8:offset + filename_len * 8 + payload_size * 8]
-        if len(payload_bits) != payload_size * 8:
+    def _decode_audio_range(self, wav, key, num_lsbs, header):
+        """SAR1 layout: gather only from the recorded frame range."""
+        key_hash, _ = self.hash_key(key)
+        stored_key_hash, payload_size, filename_len, start_frame, end_frame = header
+        if stored_key_hash != key_hash[:4]:
+            raise ValueError("Wrong secret key.")
+        params = wav.params
+        if filename_len == 0 or not 0 <= start_frame < end_frame <= params.nframes:
+            raise ValueError("Corrupted range header.")
+        first, size = _sar_body_range(params.nchannels, start_frame, end_frame)
+        if (filename_len + payload_size) * 8 > size * num_lsbs:
             raise ValueError("Incomplete payload data")
+        low_bytes = wav.low_bytes()
+
+        def read(offset, nbytes):
+            # body bytes offset .. offset + nbytes, from just the symbols covering them
+            start = offset * 8 // num_lsbs
+            stop = -(-(offset + nbytes) * 8 // num_lsbs)
+            positions = _sar_positions(key_hash, first, size, start, stop)
+            return _lsb_extract_bytes(low_bytes, positions, num_lsbs,
+                                      offset * 8 - start * num_lsbs, nbytes)
 
-        payload_data = payload_bits.tobytes()
+        filename = read(0, filename_len).decode("utf-8", errors="replace")
         extracted_path = os.path.join(os.path.dirname(
-            stego_path), f"extracted_{filename}")
+            wav.path), f"extracted_{filename}")
         is_text = filename.endswith(".txt")
 
         try:
             with open(extracted_path, "wb") as f:
-                f.write(payload_data)
+                for start in range(0, payload_size, _AUDIO_BLOCK_BYTES):
+                    f.write(read(filename_len + start,
+                                 min(_AUDIO_BLOCK_BYTES, payload_size - start)))
         except Exception as e:
             raise ValueError(f"Failed to save extracted file: {str(e)}")
 
@@ -2217,10 +4934,8 @@ class StegApp(TkinterDnD.Tk):
         if not audio_path or not os.path.exists(audio_path):
             return None
         try:
-            with wave.open(audio_path, 'rb') as wav_file:
-                frames = wav_file.getnframes()
-                channels = wav_file.getnchannels()
-                total_samples = frames * channels
+            with _WavFile(audio_path) as wav:
+                total_samples = wav.params.nframes * wav.params.nchannels
             filename = "text_payload.txt" if self.audio_payload_type.get(
             ) == "text" else os.path.basename(self.audio_payload_path.get())
             metadata_size = 9 + len(filename)  # bytes
@@ -2236,9 +4951,11 @@ class StegApp(TkinterDnD.Tk):
         if not video_path or not os.path.exists(video_path):
             return None
         try:
-            params = self.get_video_params(video_path)
-            width, height = params['width'], params['height']
-            total_pixels = 1 * width * height * 3  # First I-frame only
+            probe = VideoProbe.of(video_path)
+            width, height = probe.width, probe.height
+            # First I-frame only, unless the payload is spread over keyframes
+            frames = probe.keyframe_count if self.video_spread_mode.get() else 1
+            total_pixels = frames * width * height * 3
             filename = "text_payload.txt" if self.video_payload_type.get(
             ) == "text" else os.path.basename(self.video_payload_path.get())
             metadata_size = 9 + len(filename)  # bytes
@@ -2289,7 +5006,7 @@ class StegApp(TkinterDnD.Tk):
             return
         try:
             capacity_bytes = self._calculate_audio_capacity(
-                audio_path, self.audio_num_lsbs.get())
+                audio_path, self.audio_num_lsbs.get(), self.get_audio_embed_range())
             capacity_kb = capacity_bytes / 1024
 
             payload_size = 0
@@ -2323,7 +5040,8 @@ class StegApp(TkinterDnD.Tk):
             return
         try:
             capacity_bytes = self._calculate_video_capacity(
-                video_path, self.video_num_lsbs.get())
+                video_path, self.video_num_lsbs.get(),
+                spread=self.video_spread_mode.get())
             capacity_kb = capacity_bytes / 1024
 
             payload_size = 0
@@ -2359,21 +5077,29 @@ class StegApp(TkinterDnD.Tk):
             num_pixels = width * height
         return (num_pixels * 3 * num_lsbs) // 8
 
-    def _calculate_audio_capacity(self, audio_path, num_lsbs):
+    def _calculate_audio_capacity(self, audio_path, num_lsbs, frame_range=None):
         try:
-            with wave.open(audio_path, 'rb') as wav_file:
-                frames = wav_file.getnframes()
-                channels = wav_file.getnchannels()
-                total_samples = frames * channels
+            with _WavFile(audio_path) as wav:
+                total_samples = wav.params.nframes * wav.params.nchannels
+            if frame_range:
+                _, total_samples = _sar_body_range(
+                    wav.params.nchannels, *frame_range)
             max_bits = total_samples * num_lsbs
             return max_bits // 8
         except Exception:
             return 0
 
-    def _calculate_video_capacity(self, video_path, num_lsbs):
+    def _calculate_video_capacity(self, video_path, num_lsbs, spread=False):
         try:
-            params = self.get_video_params(video_path)
-            width, height = params['width'], params['height']
+            probe = VideoProbe.of(video_path)
+            width, height = probe.width, probe.height
+            if spread:
+                # Every keyframe whose time the first frame's manifest can
+                # hold, less the manifest itself
+                capacity = _svm_frame_capacity(width, height, num_lsbs)
+                count = min(probe.keyframe_count,
+                            (capacity - _SVM_FIXED_BYTES) // 8)
+                return max(0, count * (capacity - 8) - _SVM_FIXED_BYTES)
             total_pixels = 1 * width * height * 3  # First I-frame only
             max_bits = total_pixels * num_lsbs
             return max_bits // 8
@@ -2385,17 +5111,20 @@ class StegApp(TkinterDnD.Tk):
         stego_img = Image.open(stego_path).convert('RGB')
         if cover_img.size != stego_img.size:
             raise ValueError("Images must have the same dimensions")
-        width, height = cover_img.size
-        diff_img = Image.new('RGB', (width, height))
-        cp, sp, dp = cover_img.load(), stego_img.load(), diff_img.load()
-        for y in range(height):
-            for x in range(width):
-                dp[x, y] = (255, 0, 0) if cp[x, y] != sp[x, y] else (0, 0, 0)
+        diff_img = self._difference_image(
+            np.asarray(cover_img), np.asarray(stego_img))
         diff_path = os.path.join(os.path.dirname(
             cover_path), "difference_map.png")
         diff_img.save(diff_path)
         return diff_path
 
+    def _difference_image(self, cover, stego):
+        """Red where any channel of a pixel changed, black elsewhere."""
+        changed = np.any(cover != stego, axis=2)
+        diff = np.zeros(cover.shape[:2] + (3,), dtype=np.uint8)
+        diff[changed, 0] = 255
+        return Image.fromarray(diff, 'RGB')
+
     # -------------------- IMAGE DISPLAY / SELECTION --------------------
     def setup_canvas_bindings(self):
         self.cover_canvas.bind("<ButtonPress-1>", self.on_press)
@@ -2465,6 +5194,77 @@ class StegApp(TkinterDnD.Tk):
         self.embed_region_orig = None
         self.update_capacity_display()
 
+    # -------------------- AUDIO RANGE SELECTION --------------------
+    def _audio_range_frames(self, x0, x1):
+        """Canvas x span on the cover waveform -> (start, end) frames, or None."""
+        with _WavFile(self.audio_cover_path.get()) as wav:
+            nframes = wav.params.nframes
+        width = max(1, self.audio_canvas_cover.winfo_width())
+        lo, hi = sorted((x0, x1))
+        start = int(round(max(0, min(width, lo)) / width * nframes))
+        end = int(round(max(0, min(width, hi)) / width * nframes))
+        return (start, end) if start < end else None
+
+    def on_audio_range_press(self, event):
+        if not self.audio_cover_path.get():
+            return
+        self.audio_range_start_x = event.x
+        self.audio_canvas_cover.delete("range")
+        self.audio_canvas_cover.create_rectangle(
+            event.x, 0, event.x, self.audio_canvas_cover.winfo_height(),
+            outline='red', width=2, tags="range")
+
+    def on_audio_range_drag(self, event):
+        if self.audio_range_start_x is None:
+            return
+        width = self.audio_canvas_cover.winfo_width()
+        cur_x = max(0, min(width, event.x))
+        self.audio_canvas_cover.coords(
+            "range", self.audio_range_start_x, 0, cur_x,
+            self.audio_canvas_cover.winfo_height())
+
+    def on_audio_range_release(self, event):
+        if self.audio_range_start_x is None:
+            return
+        try:
+            self.audio_embed_range = self._audio_range_frames(
+                self.audio_range_start_x, event.x)
+        except Exception:
+            self.audio_embed_range = None
+        self.audio_range_start_x = None
+        self._draw_audio_range()
+        self.update_audio_capacity_display()
+
+    def _draw_audio_range(self):
+        """Overlay the selected range on the cover waveform and describe it."""
+        self.audio_canvas_cover.delete("range")
+        if not self.audio_embed_range:
+            self.audio_range_label.config(
+                text="Embed range: whole file (drag on the cover waveform to select)")
+            return
+        start, end = self.audio_embed_range
+        try:
+            with _WavFile(self.audio_cover_path.get()) as wav:
+                nframes, rate = wav.params.nframes, wav.params.framerate
+        except Exception:
+            return
+        width = self.audio_canvas_cover.winfo_width()
+        self.audio_canvas_cover.create_rectangle(
+            start / nframes * width, 0, end / nframes * width,
+            self.audio_canvas_cover.winfo_height(), outline='red', width=2, tags="range")
+        self.audio_range_label.config(
+            text=f"Embed range: {start / rate:.2f} s - {end / rate:.2f} s")
+
+    def get_audio_embed_range(self):
+        return self.audio_embed_range
+
+    def clear_audio_range(self):
+        self.audio_embed_range = None
+        self.audio_range_start_x = None
+        if hasattr(self, 'audio_canvas_cover'):
+            self._draw_audio_range()
+        self.update_audio_capacity_display()
+
      # -------------------- ANALYSIS TAB --------------------
 
     def setup_analysis_tab(self, parent):
@@ -2503,6 +5303,7 @@ class StegApp(TkinterDnD.Tk):
                   bg='#4CAF50', fg='white', font=('Helvetica', 11, 'bold')).pack(side=tk.LEFT, padx=4)
         tk.Button(actions, text="🗑️ Clear", command=self.clear_analysis_ui,
                   bg='#FF9800', fg='white').pack(side=tk.LEFT, padx=4)
+        self._add_job_bar(actions, "image_analysis")
 
         # ---- Results (text) ----
         self.analysis_text = tk.Text(
@@ -2728,18 +5529,23 @@ class StegApp(TkinterDnD.Tk):
             messagebox.showerror(
                 "Error", "Select a suspected stego image first.")
             return
+        cover_hint = self.analysis_cover_hint_path.get().strip()
 
-        try:
+        def work(job):
+            job.progress(0.0, "Loading image…")
             img = Image.open(path).convert('RGB')
             arr = np.array(img, dtype=np.uint8)
 
             # ---- Metrics (unchanged) ----
+            job.progress(0.2, "Computing LSB statistics…")
             chi_p = self._chi_square_lsb_pvalue(arr)
             corr = self._neighbor_correlation(arr)
             lsb_ratio = self._lsb_one_ratio(arr)
             heat = self._lsb_variance_heatmap(arr, block=8)
+            job.check()
 
             # ---- Visuals (TOP ROW unchanged) ----
+            job.progress(0.6, "Rendering visuals…")
             lsb_img = self._render_lsb_plane(arr)                  # top-left
             heat_img = self._render_heatmap_image(heat, img.size)   # top-right
 
@@ -2748,16 +5554,13 @@ class StegApp(TkinterDnD.Tk):
             hist_stego_img = self._render_histograms_gui_style(arr)
 
             hist_cover_img = None
-            cover_hint = self.analysis_cover_hint_path.get().strip()
-            if cover_hint and os.path.exists(cover_hint):
+            has_cover = bool(cover_hint and os.path.exists(cover_hint))
+            if has_cover:
                 cover_img = Image.open(cover_hint).convert('RGB')
                 cover_arr = np.array(cover_img, dtype=np.uint8)
                 hist_cover_img = self._render_histograms_gui_style(cover_arr)
 
             # ---- Report text (matches new layout) ----
-            has_cover = bool(self.analysis_cover_hint_path.get().strip(
-            ) and os.path.exists(self.analysis_cover_hint_path.get().strip()))
-
             report = []
             report.append("Steganalysis Report\n-------------------")
             report.append(
@@ -2777,7 +5580,10 @@ class StegApp(TkinterDnD.Tk):
             report.append(
                 "Bottom row: LSB plane (left) and LSB-variance heatmap (right).")
             report.append("")  # blank line
+            return report, hist_cover_img, hist_stego_img, lsb_img, heat_img
 
+        def done(result):
+            report, hist_cover_img, hist_stego_img, lsb_img, heat_img = result
             self.analysis_text.delete(1.0, tk.END)
             self.analysis_text.insert(1.0, "\n".join(report))
 
@@ -2820,9 +5626,11 @@ class StegApp(TkinterDnD.Tk):
                 bottom_right_tk=heat_tk
             )
 
-        except Exception as e:
+        def failed(e):
             messagebox.showerror("Analysis Error", str(e))
 
+        self._start_job("image_analysis", work, done, failed)
+
     def _lsb_one_ratio(self, arr):
         # Combine all channels; ratio of LSB=1
         lsb = arr & 1
@@ -3100,6 +5908,7 @@ class StegApp(TkinterDnD.Tk):
                   bg='#009688', fg='white').pack(side=tk.LEFT, padx=4)
         tk.Button(actions, text="🗑️ Clear", command=self._an_clear_ui,
                   bg='#FF9800', fg='white').pack(side=tk.LEFT, padx=4)
+        self._add_job_bar(actions, "audio_analysis")
 
         self.an_audio_text = tk.Text(
             pad, height=10, bg='#f8f8f8', relief=tk.SUNKEN, bd=2, font=('Consolas', 10))
@@ -3269,16 +6078,17 @@ class StegApp(TkinterDnD.Tk):
         if not path:
             messagebox.showerror("Error", "Select a WAV file to analyze.")
             return
+        # ---- choose bit-plane from slider (1..8 on UI ⇒ 0..7 bit index) ----
+        k = max(0, min(int(self.an_audio_lsbs.get()) - 1, 7))
+        cover_path = self.an_audio_cover_hint.get().strip()
 
-        try:
+        def work(job):
             # ---- load suspected stego ----
             # (N, C) int array (8/16/24-bit handled)
+            job.progress(0.0, "Loading audio…")
             params, samples = self._wav_read_any(path)
             N, C = samples.shape
 
-            # ---- choose bit-plane from slider (1..8 on UI ⇒ 0..7 bit index) ----
-            k = max(0, min(int(self.an_audio_lsbs.get()) - 1, 7))
-
             # ---- headline metrics on selected bit-plane k ----
             chi_p_overall, chi_p_ch = self._chi_square_lsb_audio(samples, k)
             corr_overall, corr_ch = self._neighbor_corr_audio(
@@ -3293,6 +6103,8 @@ class StegApp(TkinterDnD.Tk):
             autodet_rows = []
             best = None
             for d in range(1, 9):
+                job.progress(0.1 + 0.07 * d, f"Scanning LSB depth {d}/8…")
+                job.check()
                 kk = d - 1
                 chi_p_o, _ = self._chi_square_lsb_audio(samples, kk)
                 _, corr_ch_tmp = self._neighbor_corr_audio(samples)
@@ -3314,15 +6126,14 @@ class StegApp(TkinterDnD.Tk):
                     best = row
 
             # ---- optional difference view with original cover ----
+            job.progress(0.7, "Rendering visuals…")
             diff_img = None
-            cover_path = self.an_audio_cover_hint.get().strip()
             if cover_path and os.path.exists(cover_path):
                 _, cover_samples = self._wav_read_any(cover_path)
                 diff_img = self._render_audio_diff(cover_samples, samples)
 
             # ---- visuals ----
             # BEFORE (cover) waveform for top-left
-            cover_path = self.an_audio_cover_hint.get().strip()
             cover_samples = None
             if cover_path and os.path.exists(cover_path):
                 _, cover_samples = self._wav_read_any(cover_path)
@@ -3352,33 +6163,6 @@ class StegApp(TkinterDnD.Tk):
                 title=f"Block Variance (bit-plane {k})"
             )
 
-            # ---- show images ----
-            def _to_tk(im, max_wh=(450, 450)):
-                imc = im.copy()
-                imc.thumbnail(max_wh)
-                return ImageTk.PhotoImage(imc)
-
-            before_tk = _to_tk(wave_before_img)
-            self.viz_wave.configure(image=before_tk)
-            self.viz_wave.image = before_tk
-
-            after_tk = _to_tk(wave_after_img)
-            self.viz_spec.configure(image=after_tk)
-            self.viz_spec.image = after_tk
-
-            spec_tk = _to_tk(spec_img)
-            self.viz_lsbvar.configure(image=spec_tk)
-            self.viz_lsbvar.image = spec_tk
-
-            if diff_img is not None:
-                diff_tk = _to_tk(diff_img)
-                self.viz_diffaudio.configure(image=diff_tk)
-                self.viz_diffaudio.image = diff_tk
-            else:
-                var_tk = _to_tk(lsbvar_img)
-                self.viz_diffaudio.configure(image=var_tk)
-                self.viz_diffaudio.image = var_tk
-
             # ---- report text ----
             sr = params.framerate
             dur = N / float(sr) if sr else 0.0
@@ -3411,14 +6195,47 @@ class StegApp(TkinterDnD.Tk):
                 lines.append(f"  - ch{c+1}: {lsb_ratio_ch[c]:.4f}")
             lines.append(
                 f"Mean block variance on plane {k}: {lsb_var_mean:.4f}")
+            return lines, wave_before_img, wave_after_img, spec_img, diff_img, lsbvar_img
+
+        def done(result):
+            lines, wave_before_img, wave_after_img, spec_img, diff_img, lsbvar_img = result
+
+            # ---- show images ----
+            def _to_tk(im, max_wh=(450, 450)):
+                imc = im.copy()
+                imc.thumbnail(max_wh)
+                return ImageTk.PhotoImage(imc)
+
+            before_tk = _to_tk(wave_before_img)
+            self.viz_wave.configure(image=before_tk)
+            self.viz_wave.image = before_tk
+
+            after_tk = _to_tk(wave_after_img)
+            self.viz_spec.configure(image=after_tk)
+            self.viz_spec.image = after_tk
+
+            spec_tk = _to_tk(spec_img)
+            self.viz_lsbvar.configure(image=spec_tk)
+            self.viz_lsbvar.image = spec_tk
+
+            if diff_img is not None:
+                diff_tk = _to_tk(diff_img)
+                self.viz_diffaudio.configure(image=diff_tk)
+                self.viz_diffaudio.image = diff_tk
+            else:
+                var_tk = _to_tk(lsbvar_img)
+                self.viz_diffaudio.configure(image=var_tk)
+                self.viz_diffaudio.image = var_tk
 
             # ---- show text ----
             self.an_audio_text.delete(1.0, tk.END)
             self.an_audio_text.insert(1.0, "\n".join(lines))
 
-        except Exception as e:
+        def failed(e):
             messagebox.showerror("Analysis Error", str(e))
 
+        self._start_job("audio_analysis", work, done, failed)
+
     def _score_stegoish(self, chi_p, corr, lsb_ratio, var_mean):
         """
         Heuristic: higher = more 'stego-ish'.
@@ -3433,36 +6250,13 @@ class StegApp(TkinterDnD.Tk):
         return 0.35 * (1.0 - chi_p) + 0.35 * (1.0 - corr) + 0.15 * near_half + 0.15 * var_mean
 
     def _wav_read_any(self, path):
-        with wave.open(path, 'rb') as w:
-            params = w.getparams()
-            frames = w.readframes(params.nframes)
-
-        # dtype by sampwidth
-        sw = params.sampwidth
-        if sw == 1:
-            arr = np.frombuffer(frames, dtype=np.uint8).astype(
-                np.uint16)  # 0..255
-        elif sw == 2:
-            arr = np.frombuffer(frames, dtype=np.int16).astype(np.int32)
-        elif sw == 3:
-            raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
-            vals = (raw[:, 0].astype(np.uint32) |
-                    (raw[:, 1].astype(np.uint32) << 8) |
-                    (raw[:, 2].astype(np.uint32) << 16))
-            # interpret as signed 24-bit
-            sign = (vals & 0x800000) != 0
-            vals = vals - (sign.astype(np.uint32) << 24)
-            arr = vals.astype(np.int32)
-        else:
-            raise ValueError("Unsupported sample width (8/16/24-bit only).")
-
-        # channels
-        C = params.nchannels
-        if C == 1:
-            samples = arr.reshape(-1, 1)
-        else:
-            samples = arr.reshape(-1, C)
-        return params, samples
+        # Samples are copied out of the mapping (24-bit already is a widened
+        # copy) so the file is closed and can be replaced or deleted later.
+        with _WavFile(path) as wav:
+            samples = wav.int_samples()
+            if wav.params.sampwidth != 3:
+                samples = np.array(samples)
+            return wav.params, samples
 
     def _chi_square_lsb_audio(self, samples, bit_index=0):
         """Chi-square on the selected bit-plane (0 = LSB)."""
@@ -3822,6 +6616,7 @@ class StegApp(TkinterDnD.Tk):
                   bg='#009688', fg='white').pack(side=tk.LEFT, padx=4)
         tk.Button(actions, text="🗑️ Clear", command=self._an_video_clear_ui,
                   bg='#FF9800', fg='white').pack(side=tk.LEFT, padx=4)
+        self._add_job_bar(actions, "video_analysis")
 
         self.an_video_text = tk.Text(
             container, height=10, bg='#f8f8f8', relief=tk.SUNKEN, bd=2, font=('Consolas', 10))
@@ -3901,147 +6696,145 @@ class StegApp(TkinterDnD.Tk):
         if not path:
             messagebox.showerror("Error", "Select a video file to analyze.")
             return
+        # ---- choose bit-plane from slider (1..8 on UI ⇒ 0..7 bit index) ----
+        k = max(0, min(int(self.an_video_lsbs.get()) - 1, 7))
+        cover_path = self.an_video_cover_hint.get().strip()
 
-        try:
-            with tempfile.TemporaryDirectory() as tmpdir:
-                # Extract first I-frame from stego video
-                stego_iframe_path = self._extract_first_iframe(
-                    path, tmpdir, "stego_iframe.png")
-                if not os.path.exists(stego_iframe_path):
-                    raise ValueError("No I-frame found in stego video.")
-
-                # Load I-frame as array
-                img = Image.open(stego_iframe_path).convert('RGB')
-                arr = np.array(img, dtype=np.uint8)
-
-                # ---- choose bit-plane from slider (1..8 on UI ⇒ 0..7 bit index) ----
-                k = max(0, min(int(self.an_video_lsbs.get()) - 1, 7))
-
-                # ---- headline metrics on selected bit-plane k ----
-                chi_p = self._chi_square_lsb_pvalue(arr)
-                corr = self._neighbor_correlation(arr)
-                lsb_ratio = self._lsb_one_ratio(arr)
-                heat = self._lsb_variance_heatmap(arr, block=8)  # 8x8 blocks
-
-                # ---- auto-detect most likely bit depth (scan 1..8 → bit_index 0..7) ----
-                autodet_rows = []
-                best = None
-                for d in range(1, 9):
-                    kk = d - 1
-                    chi_p_o = self._chi_square_lsb_pvalue(arr)
-                    corr_o = self._neighbor_correlation(arr)
-                    lsb_ratio_o = self._lsb_one_ratio(arr)
-                    series = self._lsb_variance_heatmap(arr, block=8)
-                    var_mean = float(series.mean()) if series.size else 0.0
-                    score = float(self._score_stegoish(
-                        chi_p_o, corr_o, lsb_ratio_o, var_mean))
-                    row = {
-                        "lsbs": d, "score": score,
-                        "chi_p": float(chi_p_o),
-                        "corr": float(corr_o),
-                        "lsb_ratio": float(lsb_ratio_o),
-                        "var": float(var_mean),
-                    }
-                    autodet_rows.append(row)
-                    if (best is None) or (row["score"] > best["score"]):
-                        best = row
-
-                # ---- optional difference view with original cover ----
-                diff_img = None
-                hist_cover_img = None
-                cover_path = self.an_video_cover_hint.get().strip()
-                if cover_path and os.path.exists(cover_path):
-                    cover_iframe_path = self._extract_first_iframe(
-                        cover_path, tmpdir, "cover_iframe.png")
-                    if os.path.exists(cover_iframe_path):
-                        cover_img = Image.open(
-                            cover_iframe_path).convert('RGB')
-                        cover_arr = np.array(cover_img, dtype=np.uint8)
-                        diff_img = self._render_diff_amplified(
-                            cover_img, img, factor=16)
-                        hist_cover_img = self._render_histograms_gui_style(
-                            cover_arr)  # Changed to match Image Analysis style
-
-                # ---- visuals ----
-                lsb_img = self._render_lsb_plane(arr)
-                hist_img = self._render_histograms_gui_style(
-                    arr)     # Changed to match Image Analysis style
-                heat_img = self._render_heatmap_image(heat, img.size)
-
-                # ---- video params ----
-                params = self.get_video_params(path)
-                duration = params['duration']
-                resolution = f"{params['width']}x{params['height']}"
-                fps = params['fps']
-                i_frame_count = params['i_frame_count']
-
-                # ---- report text ----
-                lines = []
-                lines.append(
-                    "Auto-detect (scan LSB=1..8 on first I-frame): higher score = more 'stego-ish'")
-                for r in autodet_rows:
-                    lines.append(
-                        f"LSBs={r['lsbs']}: score={r['score']:.3f} | "
-                        f"chi_p={r['chi_p']:.4f} corr={r['corr']:.4f} "
-                        f"lsb_ratio={r['lsb_ratio']:.4f} var={r['var']:.4f}"
-                    )
-                if best:
-                    lines.append(
-                        f"\nLikely LSB depth: {best['lsbs']} (score {best['score']:.3f})\n")
+        def work(job):
+            # Extract the stego frame (first I-frame if untagged) as an array
+            job.progress(0.0, "Extracting stego frame…")
+            arr = self._extract_stego_frame(path)
+            img = Image.fromarray(arr)
 
-                lines.append("Summary on first I-frame (bit-plane 0)")
-                lines.append("------------------------")
-                lines.append(
-                    f"Video: {os.path.basename(path)}  |  Duration: {duration:.2f}s | Resolution: {resolution} | FPS: {fps:.2f} | I-frames: {i_frame_count}")
-                lines.append(f"Analyzed bit-plane: {k}  (UI value {k+1})")
-                lines.append(f"Chi-square LSB p-value: {chi_p:.4f}")
-                lines.append(
-                    f"Neighbor correlation (0..1). Natural images ~0.90–0.99: {corr:.4f}")
+            # ---- headline metrics on selected bit-plane k ----
+            chi_p = self._chi_square_lsb_pvalue(arr)
+            corr = self._neighbor_correlation(arr)
+            lsb_ratio = self._lsb_one_ratio(arr)
+            heat = self._lsb_variance_heatmap(arr, block=8)  # 8x8 blocks
+
+            # ---- auto-detect most likely bit depth (scan 1..8 → bit_index 0..7) ----
+            autodet_rows = []
+            best = None
+            for d in range(1, 9):
+                job.progress(0.1 + 0.07 * d, f"Scanning LSB depth {d}/8…")
+                job.check()
+                kk = d - 1
+                chi_p_o = self._chi_square_lsb_pvalue(arr)
+                corr_o = self._neighbor_correlation(arr)
+                lsb_ratio_o = self._lsb_one_ratio(arr)
+                series = self._lsb_variance_heatmap(arr, block=8)
+                var_mean = float(series.mean()) if series.size else 0.0
+                score = float(self._score_stegoish(
+                    chi_p_o, corr_o, lsb_ratio_o, var_mean))
+                row = {
+                    "lsbs": d, "score": score,
+                    "chi_p": float(chi_p_o),
+                    "corr": float(corr_o),
+                    "lsb_ratio": float(lsb_ratio_o),
+                    "var": float(var_mean),
+                }
+                autodet_rows.append(row)
+                if (best is None) or (row["score"] > best["score"]):
+                    best = row
+
+            # ---- optional difference view with original cover ----
+            job.progress(0.7, "Rendering visuals…")
+            diff_img = None
+            hist_cover_img = None
+            if cover_path and os.path.exists(cover_path):
+                cover_arr = self._extract_first_iframe(cover_path)
+                cover_img = Image.fromarray(cover_arr)
+                diff_img = self._render_diff_amplified(
+                    cover_img, img, factor=16)
+                hist_cover_img = self._render_histograms_gui_style(
+                    cover_arr)  # Changed to match Image Analysis style
+
+            # ---- visuals ----
+            lsb_img = self._render_lsb_plane(arr)
+            hist_img = self._render_histograms_gui_style(
+                arr)     # Changed to match Image Analysis style
+            heat_img = self._render_heatmap_image(heat, img.size)
+
+            # ---- video params ----
+            params = self.get_video_params(path)
+            duration = params['duration']
+            resolution = f"{params['width']}x{params['height']}"
+            fps = params['fps']
+            i_frame_count = params['i_frame_count']
+
+            # ---- report text ----
+            lines = []
+            lines.append(
+                "Auto-detect (scan LSB=1..8 on first I-frame): higher score = more 'stego-ish'")
+            for r in autodet_rows:
                 lines.append(
-                    f"LSB ones-ratio (should be near 0.5): {lsb_ratio:.4f}")
+                    f"LSBs={r['lsbs']}: score={r['score']:.3f} | "
+                    f"chi_p={r['chi_p']:.4f} corr={r['corr']:.4f} "
+                    f"lsb_ratio={r['lsb_ratio']:.4f} var={r['var']:.4f}"
+                )
+            if best:
                 lines.append(
-                    "Heatmap: bright regions = higher LSB variability (possible embedding zones)\n")
-
-                # ---- show text ----
-                self.an_video_text.delete(1.0, tk.END)
-                self.an_video_text.insert(1.0, "\n".join(lines))
-
-                # ---- show images ----
-                def _to_tk(im, max_wh=(450, 450)):
-                    imc = im.copy()
-                    imc.thumbnail(max_wh)
-                    return ImageTk.PhotoImage(imc)
-
-                # Assign to match labels: Cover Hist (if available), Stego Hist, LSB Plane, Heatmap/Diff
-                if hist_cover_img is not None:
-                    cov_tk = _to_tk(hist_cover_img)
-                    self.viz_video_lsb_label.configure(image=cov_tk)
-                    self.viz_video_lsb_label.image = cov_tk
-                else:
-                    self.viz_video_lsb_label.configure(
-                        image='', text="Cover Histogram (optional)")
-                    self.viz_video_lsb_label.image = None
-
-                stego_tk = _to_tk(hist_img)
-                self.viz_video_heat_label.configure(image=stego_tk)
-                self.viz_video_heat_label.image = stego_tk
-
-                lsb_tk = _to_tk(lsb_img)
-                self.viz_video_hist_label.configure(image=lsb_tk)
-                self.viz_video_hist_label.image = lsb_tk
-
-                if diff_img is not None:
-                    diff_tk = _to_tk(diff_img)
-                    self.viz_video_diff_label.configure(image=diff_tk)
-                    self.viz_video_diff_label.image = diff_tk
-                else:
-                    heat_tk = _to_tk(heat_img)
-                    self.viz_video_diff_label.configure(image=heat_tk)
-                    self.viz_video_diff_label.image = heat_tk
+                    f"\nLikely LSB depth: {best['lsbs']} (score {best['score']:.3f})\n")
 
-        except Exception as e:
+            lines.append("Summary on first I-frame (bit-plane 0)")
+            lines.append("------------------------")
+            lines.append(
+                f"Video: {os.path.basename(path)}  |  Duration: {duration:.2f}s | Resolution: {resolution} | FPS: {fps:.2f} | I-frames: {i_frame_count}")
+            lines.append(f"Analyzed bit-plane: {k}  (UI value {k+1})")
+            lines.append(f"Chi-square LSB p-value: {chi_p:.4f}")
+            lines.append(
+                f"Neighbor correlation (0..1). Natural images ~0.90–0.99: {corr:.4f}")
+            lines.append(
+                f"LSB ones-ratio (should be near 0.5): {lsb_ratio:.4f}")
+            lines.append(
+                "Heatmap: bright regions = higher LSB variability (possible embedding zones)\n")
+            return lines, hist_cover_img, hist_img, lsb_img, diff_img, heat_img
+
+        def done(result):
+            lines, hist_cover_img, hist_img, lsb_img, diff_img, heat_img = result
+
+            # ---- show text ----
+            self.an_video_text.delete(1.0, tk.END)
+            self.an_video_text.insert(1.0, "\n".join(lines))
+
+            # ---- show images ----
+            def _to_tk(im, max_wh=(450, 450)):
+                imc = im.copy()
+                imc.thumbnail(max_wh)
+                return ImageTk.PhotoImage(imc)
+
+            # Assign to match labels: Cover Hist (if available), Stego Hist, LSB Plane, Heatmap/Diff
+            if hist_cover_img is not None:
+                cov_tk = _to_tk(hist_cover_img)
+                self.viz_video_lsb_label.configure(image=cov_tk)
+                self.viz_video_lsb_label.image = cov_tk
+            else:
+                self.viz_video_lsb_label.configure(
+                    image='', text="Cover Histogram (optional)")
+                self.viz_video_lsb_label.image = None
+
+            stego_tk = _to_tk(hist_img)
+            self.viz_video_heat_label.configure(image=stego_tk)
+            self.viz_video_heat_label.image = stego_tk
+
+            lsb_tk = _to_tk(lsb_img)
+            self.viz_video_hist_label.configure(image=lsb_tk)
+            self.viz_video_hist_label.image = lsb_tk
+
+            if diff_img is not None:
+                diff_tk = _to_tk(diff_img)
+                self.viz_video_diff_label.configure(image=diff_tk)
+                self.viz_video_diff_label.image = diff_tk
+            else:
+                heat_tk = _to_tk(heat_img)
+                self.viz_video_diff_label.configure(image=heat_tk)
+                self.viz_video_diff_label.image = heat_tk
+
+        def failed(e):
             messagebox.showerror("Analysis Error", str(e))
 
+        self._start_job("video_analysis", work, done, failed)
+
     def _an_video_save_report(self):
         text = self.an_video_text.get("1.0", tk.END).strip()
         if not text:
@@ -4081,14 +6874,20 @@ class StegApp(TkinterDnD.Tk):
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Block-mode audio over files or pipes, without the GUI
+        try:
+            _audio_stream_main(sys.argv[1:])
+        except (ValueError, OSError, EOFError, wave.Error) as e:
+            sys.exit(f"Error: {e}")
+        sys.exit(0)
     try:
         app = StegApp()
         app.mainloop()
     except ImportError as e:
         print("Error: Missing required library.")
         print("Please install required packages:")
-        print("pip install tkinterdnd2 pillow numpy")
-        print("pip install bitarray")
+        print("pip install tkinterdnd2 pillow numpy matplotlib")
         print(f"\nSpecific error: {e}")
     except Exception as e:
         print(f"An error occurred: {e}")
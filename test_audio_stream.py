@@ -0,0 +1,66 @@
+"""
+Pipe round trip for the block-mode (SAB1) audio command line: the decoder
+stops reading once it has the payload, and the encoder feeding it must still
+finish cleanly.
+
+Run with: python -m unittest test_audio_stream  (or python -m pytest)
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import wave
+
+import numpy as np
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main_gui.py")
+
+
+class AudioPipeTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cover = os.path.join(tmp.name, "cover.wav")
+        self.payload = os.path.join(tmp.name, "pl.bin")
+        self.output = os.path.join(tmp.name, "out.bin")
+        # Many blocks longer than the payload needs, and than a pipe buffers
+        rng = np.random.default_rng(7)
+        with wave.open(self.cover, "wb") as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(rng.integers(-3000, 3000, 44100 * 10 * 2,
+                                       dtype=np.int16).tobytes())
+        with open(self.payload, "wb") as f:
+            f.write(rng.bytes(3000))
+
+    def test_encode_to_decode_pipe(self):
+        encoder = subprocess.Popen(
+            [sys.executable, MAIN, "audio-encode", self.payload, "-k", "sec", "-n", "2"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        decoder = subprocess.Popen(
+            [sys.executable, MAIN, "audio-decode", "-k", "sec", "-n", "2",
+             "-o", self.output],
+            stdin=encoder.stdout, stderr=subprocess.PIPE)
+        encoder.stdout.close()
+
+        def feed():
+            with open(self.cover, "rb") as f, encoder.stdin:
+                encoder.stdin.write(f.read())
+        feeder = threading.Thread(target=feed)
+        feeder.start()
+        encoder_err = encoder.stderr.read()
+        decoder_err = decoder.stderr.read()
+        feeder.join()
+
+        self.assertEqual(encoder.wait(), 0, encoder_err.decode())
+        self.assertEqual(decoder.wait(), 0, decoder_err.decode())
+        with open(self.payload, "rb") as a, open(self.output, "rb") as b:
+            self.assertEqual(a.read(), b.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Golden-vector tests for the NumPy replay of random.seed(seed); random.shuffle(x).
+STG2 images and legacy audio files were written in that exact order, so
+_legacy_shuffle_permutation must keep matching it bit for bit.
+
+Run with: python -m unittest test_legacy_shuffle  (or python -m pytest)
+"""
+import hashlib
+import random
+import unittest
+
+import numpy as np
+
+from main_gui import _legacy_shuffle_draws, _legacy_shuffle_permutation
+
+
+def _key_seed(key):
+    # Same derivation as StegApp.hash_key
+    return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], 'big')
+
+
+def _shuffled(n, seed):
+    x = list(range(n))
+    random.seed(seed)
+    random.shuffle(x)
+    return x
+
+
+SEEDS = [0, 1, 12345, 2 ** 32 - 1, 2 ** 63 + 17, 2 ** 64 - 1,
+         _key_seed("k3y"), _key_seed("secret")]
+
+
+class LegacyShuffleTest(unittest.TestCase):
+
+    def test_small_sizes(self):
+        for seed in SEEDS:
+            for n in range(50):
+                with self.subTest(seed=seed, n=n):
+                    self.assertEqual(
+                        _legacy_shuffle_permutation(n, seed).tolist(),
+                        _shuffled(n, seed))
+
+    def test_draws_match_randbelow(self):
+        for seed in SEEDS[:4]:
+            for n in (2, 3, 1000, 5000, 70000):
+                rng = random.Random(seed)
+                expected = [rng._randbelow(i + 1) for i in reversed(range(1, n))]
+                js = _legacy_shuffle_draws(n, seed)
+                with self.subTest(seed=seed, n=n):
+                    self.assertEqual(js[:0:-1].tolist(), expected)
+
+    def test_large_sizes(self):
+        # Past _SCALAR_BOUND and across several bit-length ranges
+        for n, seed in ((4097, 7), (65537, SEEDS[6]), (1 << 20, SEEDS[4]),
+                        (2_000_003, SEEDS[7])):
+            with self.subTest(n=n, seed=seed):
+                self.assertTrue(np.array_equal(
+                    _legacy_shuffle_permutation(n, seed), _shuffled(n, seed)))
+
+    def test_frozen_vector(self):
+        # Recorded from CPython; guards stored files even if random.shuffle changes
+        self.assertEqual(
+            _legacy_shuffle_permutation(20, _key_seed("k3y")).tolist(),
+            [1, 5, 8, 14, 17, 2, 3, 15, 19, 18, 16, 13, 10, 12, 6, 0, 11, 7, 4, 9])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Tests for the multi-keyframe video layout (SVM1): the manifest and filename
+must fit in the first carrier frame, and only an SVM1 header marks a
+manifest, whatever the payload starts with.
+
+Run with: python -m unittest test_svm_manifest  (or python -m pytest)
+"""
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from main_gui import (StegApp, _SVM_FIXED_BYTES, _SVM_MAGIC, _svm_frame_count,
+                      _svm_pieces, _svm_read_manifest)
+
+# 160x120 at 1 LSB
+CAPACITY = 7179
+
+
+class SvmManifestTest(unittest.TestCase):
+
+    def test_largest_manifest_that_fits(self):
+        count = (CAPACITY - _SVM_FIXED_BYTES) // 8
+        payload_len = count * (CAPACITY - 8) - _SVM_FIXED_BYTES
+        self.assertEqual(_svm_frame_count(CAPACITY, payload_len, 0), count)
+        payload = np.random.default_rng(1).bytes(payload_len)
+        pieces = _svm_pieces(payload, CAPACITY, 0, [0.04 * i for i in range(count)])
+        self.assertEqual(len(pieces), count)
+        self.assertTrue(all(len(piece) <= CAPACITY for piece in pieces))
+        length, times, head = _svm_read_manifest(pieces[0])
+        self.assertEqual(length, payload_len)
+        self.assertEqual(len(times), count)
+        self.assertEqual(b"".join([head, *pieces[1:]]), payload)
+
+    def test_manifest_too_large_for_first_frame(self):
+        count = (CAPACITY - _SVM_FIXED_BYTES) // 8
+        payload_len = count * (CAPACITY - 8) - _SVM_FIXED_BYTES
+        with self.assertRaises(ValueError):
+            _svm_frame_count(CAPACITY, payload_len + 1, 0)
+        # The filename shares the first frame with the manifest
+        with self.assertRaises(ValueError):
+            _svm_frame_count(CAPACITY, payload_len - 8, 9)
+        with self.assertRaises(ValueError):
+            _svm_frame_count(CAPACITY, 6_430_000, 0)
+
+
+class SvmMarkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = StegApp.__new__(StegApp)
+        self.frame = np.random.default_rng(2).integers(
+            0, 256, (120, 160, 3), dtype=np.uint8)
+
+    def test_payload_starting_with_magic_is_single_frame(self):
+        payload = _SVM_MAGIC + b"\xff\xff" + bytes(range(200))
+        self.app._embed_image_array(self.frame, payload, "p.bin", "k", 2)
+        self.assertEqual(
+            self.app._decode_video_frame("unused.mkv", self.frame, "k", 2),
+            ("p.bin", payload))
+
+    def test_manifest_header_is_not_an_image(self):
+        piece = _svm_pieces(b"x" * 100, CAPACITY, 5, [0.0])[0]
+        self.app._embed_image_array(self.frame, piece, "p.bin", "k", 2,
+                                    magic=_SVM_MAGIC)
+        with self.assertRaises(ValueError):
+            self.app._decode_image_array(self.frame, "k", 2)
+        # A single carrier: no other frame of the video is read
+        with mock.patch("main_gui._stego_frame_time", return_value=0.0):
+            self.assertEqual(
+                self.app._decode_video_frame("unused.mkv", self.frame, "k", 2),
+                ("p.bin", b"x" * 100))
+
+
+if __name__ == "__main__":
+    unittest.main()